@@ -1,25 +1,51 @@
-from fastapi import FastAPI
+from time import perf_counter
 
-from depends import data_manager
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+
+from configs import EMBEDDED_SCHEDULER
+from db.engine import get_engine
+from db.migrations import check_schema
+from depends import get_data_manager
+from distribution.events import publish_change
 from distribution.worker import DistributionsWorker
 from routing.client import router as client_router
+from metrics import HTTP_REQUEST_DURATION
 from routing.distribution import router as distribution_router
+from routing.metrics import router as metrics_router
 from routing.stat import router as stat_router
 
 app = FastAPI(
     title="Distribution Manager",
     openapi_url="/core/openapi.json",
-    docs_url="/core/docs"
+    docs_url="/core/docs",
+    default_response_class=ORJSONResponse
 )
 
 app.include_router(client_router)
 app.include_router(distribution_router)
 app.include_router(stat_router)
+app.include_router(metrics_router)
+
+
+@app.middleware("http")
+async def observe_request_duration(request: Request, call_next):
+    started = perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_DURATION.labels(
+        request.method, route.path if route is not None else "unmatched", response.status_code
+    ).observe(perf_counter() - started)
+    return response
 
 
 @app.on_event("startup")
 async def startup_event():
-    DistributionsWorker(data_manager).start()
+    check_schema(get_engine())
+    if EMBEDDED_SCHEDULER:
+        DistributionsWorker(get_data_manager()).start()
+    else:
+        get_data_manager().subscribe(publish_change)
 
 
 @app.on_event("shutdown")
@@ -0,0 +1,82 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+from time import perf_counter
+
+from sqlalchemy import create_engine, insert, update, Engine
+from sqlalchemy.exc import OperationalError
+
+from db.engine import create_db_engine
+from db.migrations import migrate
+from db.models import Client, Distribution, Message
+
+
+def make_engine(url: str, tuned: bool) -> Engine:
+    return create_db_engine(url) if tuned else create_engine(url)
+
+
+def seed(url: str, tuned: bool, messages: int):
+    engine = make_engine(url, tuned)
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Client), [{"phone_number": 79000000000, "mobile_operator": "900",
+                                             "tag": "bench", "time_zone": "Europe/Moscow"}])
+        connection.execute(insert(Distribution), [{"start_date": datetime.now(), "name": "Distribution",
+                                                   "end_date": datetime.now() + timedelta(days=1),
+                                                   "text": "benchmark", "status": "started"}])
+        connection.execute(insert(Message), [{"distribution_id": 1, "client_id": 1, "status": "created"}
+                                             for _ in range(messages)])
+    engine.dispose()
+
+
+def writer(args) -> tuple[int, int]:
+    url, tuned, message_ids = args
+    engine = make_engine(url, tuned)
+    done = locked = 0
+    for message_id in message_ids:
+        try:
+            with engine.begin() as connection:
+                connection.execute(update(Message).where(Message.id == message_id)
+                                   .values(status="sent", sending_time=datetime.now()))
+            done += 1
+        except OperationalError:
+            locked += 1
+    engine.dispose()
+    return done, locked
+
+
+def run(url: str, tuned: bool, writers: int, writes: int):
+    ids = list(range(1, writers * writes + 1))
+    started = perf_counter()
+    with Pool(writers) as pool:
+        results = pool.map(writer, [(url, tuned, ids[i::writers]) for i in range(writers)])
+    elapsed = perf_counter() - started
+    done = sum(result[0] for result in results)
+    locked = sum(result[1] for result in results)
+    return done / elapsed, locked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel writers against each database backend")
+    parser.add_argument("--url", action="append",
+                        help="database URL to benchmark, repeatable; defaults to scratch SQLite files")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=500, help="transactions per writer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cases = [(url, True) for url in args.url or []] or [
+            (f"sqlite:///{os.path.join(directory, 'default.db')}", False),
+            (f"sqlite:///{os.path.join(directory, 'tuned.db')}", True),
+        ]
+        for url, tuned in cases:
+            seed(url, tuned, args.writers * args.writes)
+            rate, locked = run(url, tuned, args.writers, args.writes)
+            label = "tuned" if tuned else "default"
+            print(f"{make_engine(url, tuned).url.get_backend_name()} {label}: {rate:.1f} tx/s, "
+                  f"{locked} 'database is locked' errors")
+
+if __name__ == "__main__":
+    main()
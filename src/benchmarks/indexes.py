@@ -0,0 +1,86 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from sqlalchemy import insert, select, func, literal, text
+
+from db.engine import create_db_engine
+from db.migrations import migrate
+from db.models import Client, Distribution, Message
+
+QUERIES = {
+    "status counts of a distribution": select(Message.status, func.count())
+    .where(Message.distribution_id == 7).group_by(Message.status),
+    "pending messages of a distribution": select(Message.id)
+    .where((Message.distribution_id == 7) & (Message.status == "created")),
+    "audience by tag and operator": select(Client.id)
+    .where((Client.tag == "tag3") & (Client.mobile_operator == "903")),
+    "distributions by status": select(Distribution.id).where(Distribution.status == "unfinished"),
+}
+
+
+def seed(engine, clients: int, distributions: int, batch: int = 50000):
+    with engine.begin() as connection:
+        for start in range(0, clients, batch):
+            connection.execute(insert(Client), [
+                {"phone_number": 79000000000 + i, "mobile_operator": f"90{i % 10}", "tag": f"tag{i % 20}",
+                 "time_zone": "Europe/Moscow"}
+                for i in range(start, min(start + batch, clients))
+            ])
+        connection.execute(insert(Distribution), [
+            {"start_date": datetime.now(), "end_date": datetime.now() + timedelta(days=1), "text": "benchmark",
+             "name": "Distribution", "status": "unfinished" if i % 50 == 0 else "finished"}
+            for i in range(distributions)
+        ])
+        for dist_id in range(1, distributions + 1):
+            connection.execute(insert(Message).from_select(
+                ["distribution_id", "client_id", "status"],
+                select(literal(dist_id), Client.id, literal("sent"))
+                .where(Client.id % distributions == dist_id % distributions)))
+        connection.execute(text("UPDATE message SET status = 'created' WHERE id % 3 = 0"))
+
+
+def report(engine, repeat: int):
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+            plan = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+            started = perf_counter()
+            for _ in range(repeat):
+                connection.execute(query).all()
+            elapsed = (perf_counter() - started) / repeat * 1000
+            print(f"  {name}: {elapsed:.2f} ms")
+            for row in plan:
+                print(f"    {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query plans and timings before/after the index migration")
+    parser.add_argument("--clients", type=int, default=200_000)
+    parser.add_argument("--distributions", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        migrate(engine, target=2)
+        with engine.begin() as connection:
+            for table in ("distribution", "client", "message"):
+                for index in connection.execute(text(f"PRAGMA index_list({table})")).all():
+                    if not index[1].startswith("sqlite_autoindex"):
+                        connection.execute(text(f"DROP INDEX {index[1]}"))
+        seed(engine, args.clients, args.distributions)
+        print("before (schema version 2):")
+        report(engine, args.repeat)
+        migrate(engine)
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        print("after (latest schema):")
+        report(engine, args.repeat)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
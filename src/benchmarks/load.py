@@ -0,0 +1,95 @@
+import argparse
+import atexit
+import os
+import shutil
+import socket
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, local
+from time import perf_counter, sleep
+
+import requests
+import uvicorn
+
+_directory = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'bench.db')}"
+
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import app as async_app  # noqa: E402
+from db.models import Client  # noqa: E402
+from db.engine import get_engine  # noqa: E402
+from db.migrations import migrate  # noqa: E402
+from depends import get_data_manager  # noqa: E402
+
+sync_app = FastAPI()
+
+
+@sync_app.get('/client/get/{client_id}')
+def get_client(client_id: int):
+    return get_data_manager().clients.get_by_id(client_id)
+
+
+@sync_app.get('/stat/get_stat')
+def get_stat():
+    return get_data_manager().get_stat()
+
+
+def seed(clients: int):
+    with get_data_manager().session_maker() as session:
+        session.execute(insert(Client), [
+            {"phone_number": 79000000000 + i, "mobile_operator": "900", "tag": "bench", "time_zone": "Europe/Moscow"}
+            for i in range(clients)
+        ])
+        session.commit()
+
+
+def serve(app: FastAPI) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def load(url: str, paths: list, requests_count: int, concurrency: int):
+    sessions = local()
+
+    def call(i: int) -> float:
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        started = perf_counter()
+        sessions.session.get(url + paths[i % len(paths)]).raise_for_status()
+        return perf_counter() - started
+
+    started = perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = sorted(executor.map(call, range(requests_count)))
+    elapsed = perf_counter() - started
+    return requests_count / elapsed, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sync and async API paths under concurrent load")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--clients", type=int, default=1000)
+    args = parser.parse_args()
+
+    migrate(get_engine())
+    seed(args.clients)
+    paths = [f"/client/get/{i}" for i in range(1, args.clients + 1, 7)] + ["/stat/get_stat"]
+    urls = {"sync": serve(sync_app), "async": serve(async_app)}
+    for concurrency in args.concurrency:
+        for name, url in urls.items():
+            rps, p99 = load(url, paths, args.requests, concurrency)
+            print(f"{name} concurrency={concurrency}: {rps:.1f} req/s, p99 {p99:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
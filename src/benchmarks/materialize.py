@@ -0,0 +1,66 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from sqlalchemy import insert
+
+from db.engine import create_db_engine
+from db.manager import DataManager
+from db.migrations import migrate
+from db.models import Client, Distribution, Message
+
+
+def seed(data_manager: DataManager, clients: int, batch: int = 50000):
+    with data_manager.session_maker() as session:
+        for start in range(0, clients, batch):
+            session.execute(insert(Client), [
+                {"phone_number": 79000000000 + i, "mobile_operator": "900", "tag": "bench",
+                 "time_zone": "Europe/Moscow"}
+                for i in range(start, min(start + batch, clients))
+            ])
+        session.add(Distribution(start_date=datetime.now(), end_date=datetime.now() + timedelta(days=1),
+                                 text="benchmark", filter_tag="bench"))
+        session.commit()
+
+
+def legacy_create_distribution_messages(data_manager: DataManager, dist_id: int):
+    with data_manager.session_maker() as session:
+        distribution = session.get(Distribution, dist_id)
+        for client in session.query(Client).where(Client.tag == distribution.filter_tag):
+            session.add(Message(distribution_id=distribution.id, client_id=client.id))
+        distribution.status = "started"
+        session.commit()
+
+
+def run(clients: int, legacy: bool):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        migrate(engine)
+        data_manager = DataManager(engine, redis=None)
+        seed(data_manager, clients)
+        started = perf_counter()
+        if legacy:
+            legacy_create_distribution_messages(data_manager, 1)
+        else:
+            data_manager.messages.create_distribution_messages(1)
+        elapsed = perf_counter() - started
+        engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time create_distribution_messages on SQLite")
+    parser.add_argument("--clients", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy", action="store_true", help="also time the per-row ORM implementation")
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        print(f"clients={clients}: insert-select {run(clients, False):.2f}s")
+        if args.legacy:
+            print(f"clients={clients}: per-row ORM {run(clients, True):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
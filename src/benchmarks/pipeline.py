@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import atexit
+import gc
+import json
+import os
+import platform
+import shutil
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Dict, List
+
+from benchmarks.stub import ProbeStub
+
+_directory = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+_stub = ProbeStub()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'bench.db')}"
+os.environ["URL"] = _stub.url
+os.environ.setdefault("TOKEN", "benchmark")
+
+import redis_conf  # noqa: E402
+from celery_conf import celery  # noqa: E402
+from db.engine import get_engine  # noqa: E402
+from db.migrations import migrate  # noqa: E402
+from depends import get_data_manager, get_async_data_manager  # noqa: E402
+from distribution.protocol import distribution_payload  # noqa: E402
+from distribution.task import distribute  # noqa: E402
+from distribution.worker import DistributionsWorker  # noqa: E402
+from services.importer import import_clients  # noqa: E402
+from services.validation import NewDistribution  # noqa: E402
+
+TIME_ZONES = ["UTC", "Europe/Moscow", "Asia/Yekaterinburg", "Asia/Vladivostok"]
+
+
+class Stage:
+    trace_memory = True
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.items = 0
+        self.peak = None
+
+    def __enter__(self):
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.start()
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = perf_counter() - self.started
+        if self.trace_memory:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def record(self, started: float, items: int = 1):
+        self.latencies.append(perf_counter() - started)
+        self.items += items
+
+    def report(self) -> Dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(share: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * share))] * 1000, 3)
+
+        return {
+            "operations": len(latencies),
+            "items": self.items,
+            "seconds": round(self.elapsed, 4),
+            "items_per_second": round(self.items / self.elapsed, 1) if self.elapsed else None,
+            "latency_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": percentile(1.0),
+            } if latencies else None,
+            "peak_memory_mib": round(self.peak / 2 ** 20, 2) if self.peak is not None else None,
+        }
+
+
+def csv_chunks(clients: int, segments: int, chunk_rows: int = 10000):
+    async def chunks():
+        yield b"phone_number,mobile_operator,tag,time_zone\n"
+        for first in range(0, clients, chunk_rows):
+            yield "".join(
+                f"{79000000000 + i},900,segment{i % segments},{TIME_ZONES[i % len(TIME_ZONES)]}\n"
+                for i in range(first, min(first + chunk_rows, clients))
+            ).encode()
+    return chunks()
+
+
+def ingest(stage: Stage, clients: int, segments: int, batch_size: int):
+    async def save_batch(batch: List[Dict]):
+        started = perf_counter()
+        await get_async_data_manager().clients.add_many(batch)
+        stage.record(started, len(batch))
+
+    asyncio.run(import_clients(csv_chunks(clients, segments), "csv", save_batch, batch_size))
+
+
+def add_distributions(segments: int, start: datetime, end: datetime) -> List[int]:
+    return [
+        get_data_manager().distributions.add(NewDistribution(
+            name=f"benchmark {segment}", start_date=start, end_date=end, text="benchmark",
+            filter_tag=f"segment{segment}"))
+        for segment in range(segments)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with eager Celery and a probe stub")
+    parser.add_argument("--clients", type=int, default=20000)
+    parser.add_argument("--distributions", type=int, default=4, help="distributions sent, one audience segment each")
+    parser.add_argument("--scheduled", type=int, default=1000, help="future distributions for the scheduler scan")
+    parser.add_argument("--stat-calls", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub response delay, seconds")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip tracemalloc, which slows the threaded send stage noticeably")
+    parser.add_argument("--fake-redis", action="store_true", help="use fakeredis instead of REDIS_HOST")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.fake_redis:
+        import fakeredis
+        redis_conf._redis = fakeredis.FakeRedis()
+    migrate(get_engine())
+    data_manager = get_data_manager()
+    Stage.trace_memory = not args.no_memory
+    celery.conf.update(task_always_eager=True, task_eager_propagates=True)
+    _stub.server.RequestHandlerClass.latency = args.latency
+    stages = {}
+
+    with _stub:
+        with Stage("ingest") as stage:
+            ingest(stage, args.clients, args.distributions, args.batch_size)
+        stages["ingest"] = stage
+
+        now = datetime.now()
+        distribution_ids = add_distributions(args.distributions, now - timedelta(days=1), now + timedelta(days=1))
+        with Stage("materialize") as stage:
+            for dist_id in distribution_ids:
+                started = perf_counter()
+                data_manager.messages.create_distribution_messages(dist_id)
+                stage.record(started, data_manager.messages.count_pending(dist_id))
+        stages["materialize"] = stage
+
+        with Stage("distribute") as stage:
+            for dist_id in distribution_ids:
+                pending = data_manager.messages.count_pending(dist_id)
+                started = perf_counter()
+                distribute.delay(distribution_payload(dist_id))
+                stage.record(started, pending - data_manager.messages.count_pending(dist_id))
+        stages["distribute"] = stage
+
+        with Stage("get_stat") as stage:
+            for _ in range(args.stat_calls):
+                started = perf_counter()
+                data_manager.get_stat()
+                stage.record(started)
+        stages["get_stat"] = stage
+
+        with Stage("get_distribution_stat") as stage:
+            for i in range(args.stat_calls):
+                started = perf_counter()
+                data_manager.distributions.get_stat(distribution_ids[i % len(distribution_ids)], detailed=True)
+                stage.record(started)
+        stages["get_distribution_stat"] = stage
+
+        add_distributions(args.scheduled, now + timedelta(days=7), now + timedelta(days=8))
+        worker = DistributionsWorker(data_manager)
+        with Stage("scheduler_scan") as stage:
+            for distribution in data_manager.distributions.get_all():
+                started = perf_counter()
+                worker._process(distribution["id"])
+                stage.record(started)
+        stages["scheduler_scan"] = stage
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "stages": {name: stage.report() for name, stage in stages.items()},
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
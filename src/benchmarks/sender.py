@@ -0,0 +1,47 @@
+import argparse
+from time import perf_counter
+
+import requests
+
+from benchmarks.stub import ProbeStub
+from distribution.sender import MessageSender
+
+
+def payloads(count: int):
+    return ({"id": i, "phone": 79000000000 + i, "text": "benchmark"} for i in range(count))
+
+
+def run_baseline(url: str, count: int) -> float:
+    started = perf_counter()
+    for data in payloads(count):
+        requests.post(url=url + str(data["id"]), headers={"Content-Type": "application/json"}, json=data)
+    return count / (perf_counter() - started)
+
+
+def run_sender(url: str, count: int, concurrency: int) -> float:
+    sender = MessageSender(concurrency=concurrency, url=url, token="benchmark")
+    started = perf_counter()
+    failed = sum(exc is not None for _, exc in sender.send_many(payloads(count)))
+    elapsed = perf_counter() - started
+    sender.close()
+    if failed:
+        print(f"  {failed} requests failed")
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send throughput against a local probe stub")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub response delay, seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    args = parser.parse_args()
+
+    with ProbeStub(latency=args.latency) as stub:
+        baseline_count = min(args.messages, 500)
+        print(f"baseline requests.post: {run_baseline(stub.url, baseline_count):.1f} msg/s")
+        for concurrency in args.concurrency:
+            print(f"sender concurrency={concurrency}: {run_sender(stub.url, args.messages, concurrency):.1f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
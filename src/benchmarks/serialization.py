@@ -0,0 +1,69 @@
+import argparse
+import os
+import tempfile
+import tracemalloc
+from time import perf_counter
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+
+from db.engine import create_db_engine
+from db.manager import DataManager
+from db.migrations import migrate
+from db.models import Client
+from services.validation import ClientOut
+
+
+def seed(data_manager: DataManager, clients: int):
+    with data_manager.session_maker() as session:
+        session.execute(insert(Client), [
+            {"phone_number": 79000000000 + i, "mobile_operator": "900", "tag": "bench", "time_zone": "Europe/Moscow"}
+            for i in range(clients)
+        ])
+        session.commit()
+
+
+def legacy(data_manager: DataManager) -> bytes:
+    with data_manager.session_maker() as session:
+        clients = [vars(client) for client in session.query(Client).all()]
+    return JSONResponse(jsonable_encoder(clients, exclude={"_sa_instance_state"})).body
+
+
+def compact(data_manager: DataManager) -> bytes:
+    with data_manager.session_maker() as session:
+        clients = [dict(row) for row in session.execute(select(Client.__table__)).mappings()]
+    adapter = TypeAdapter(List[ClientOut])
+    return ORJSONResponse(adapter.dump_python(adapter.validate_python(clients), mode="json")).body
+
+
+def measure(name: str, serialize: Callable[[DataManager], bytes], data_manager: DataManager):
+    started = perf_counter()
+    body = serialize(data_manager)
+    elapsed = perf_counter() - started
+    tracemalloc.start()
+    serialize(data_manager)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name}: {elapsed:.2f}s, peak {peak / 2 ** 20:.1f} MiB, body {len(body) / 2 ** 20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="jsonable_encoder over ORM vars() versus response models + orjson")
+    parser.add_argument("--clients", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        migrate(engine)
+        data_manager = DataManager(engine, redis=None)
+        seed(data_manager, args.clients)
+        measure("jsonable_encoder", legacy, data_manager)
+        measure("response model + orjson", compact, data_manager)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
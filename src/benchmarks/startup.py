@@ -0,0 +1,51 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+PROBE = """
+import importlib, json, resource, sys, time
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(json.dumps({"import": time.perf_counter() - started,
+                  "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def measure(src: str, module: str, runs: int):
+    imports, totals, rss, created = [], [], [], 0
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "startup.db")
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", PYTHONDONTWRITEBYTECODE="1")
+            started = perf_counter()
+            output = subprocess.run([sys.executable, "-c", PROBE, module], cwd=src, env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            totals.append(perf_counter() - started)
+            result = json.loads(output.strip().splitlines()[-1])
+            imports.append(result["import"])
+            rss.append(result["rss"] / 1024)
+            created += os.path.exists(database)
+    print(f"{module}: import {statistics.median(imports) * 1000:.0f} ms, "
+          f"process {statistics.median(totals) * 1000:.0f} ms, "
+          f"max RSS {statistics.median(rss):.1f} MiB, database touched in {created}/{runs} runs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time and resident memory per process type")
+    parser.add_argument("--src", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="source tree to measure, e.g. a git worktree of an older commit")
+    parser.add_argument("--module", nargs="+", default=["app", "distribution.task", "manage"])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for module in args.module:
+        measure(args.src, module, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from sqlalchemy import insert, update
+
+from db.engine import create_db_engine
+from db.manager import DataManager
+from db.migrations import migrate
+from db.models import Client, Distribution, Message
+from distribution.status_buffer import StatusBuffer
+
+
+def seed(data_manager: DataManager, messages: int):
+    with data_manager.session_maker() as session:
+        session.execute(insert(Client), [{"phone_number": 79000000000, "mobile_operator": "900", "tag": "bench",
+                                          "time_zone": "Europe/Moscow"}])
+        session.add(Distribution(start_date=datetime.now(), end_date=datetime.now() + timedelta(days=1),
+                                 text="benchmark"))
+        session.flush()
+        session.execute(insert(Message), [{"distribution_id": 1, "client_id": 1, "status": "sending"}
+                                          for _ in range(messages)])
+        session.commit()
+
+
+def reset(data_manager: DataManager):
+    with data_manager.session_maker() as session:
+        session.execute(update(Message).values(status="sending", sending_time=None))
+        session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row versus batched sent-status commits")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--flush-size", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        migrate(engine)
+        data_manager = DataManager(engine, redis=None)
+        seed(data_manager, args.messages)
+
+        started = perf_counter()
+        for message_id in range(1, args.messages + 1):
+            data_manager.messages.mark_message_sent(message_id)
+        print(f"per-row commits: {args.messages / (perf_counter() - started):.1f} rows/s")
+
+        for flush_size in args.flush_size:
+            reset(data_manager)
+            started = perf_counter()
+            with StatusBuffer(data_manager, max_size=flush_size, max_delay_ms=10 ** 9) as statuses:
+                for message_id in range(1, args.messages + 1):
+                    statuses.sent(message_id)
+            print(f"batched commits, flush size {flush_size}: {args.messages / (perf_counter() - started):.1f} rows/s")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,29 @@
 from celery import Celery
+from kombu import Queue
 
-from configs import REDIS_HOST, REDIS_PORT
+from configs import REDIS_HOST, REDIS_PORT, CELERY_VISIBILITY_TIMEOUT, CELERY_RESULT_EXPIRES
 
 celery = Celery(
     "distribute",
     broker=f"redis://{REDIS_HOST}:{REDIS_PORT}",
-    accept_content=['pickle'],
-    task_serializer='pickle'
+    backend=f"redis://{REDIS_HOST}:{REDIS_PORT}",
+)
+
+celery.conf.update(
+    accept_content=["json"],
+    task_serializer="json",
+    result_serializer="json",
+    result_expires=CELERY_RESULT_EXPIRES,
+    task_queues=[Queue("scheduling"), Queue("sending"), Queue("status")],
+    task_default_queue="scheduling",
+    task_routes={
+        "distribution.task.distribute": {"queue": "scheduling"},
+        "distribution.task.send_chunk": {"queue": "sending"},
+        "distribution.task.manage_status": {"queue": "status"},
+    },
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    broker_transport_options={"visibility_timeout": CELERY_VISIBILITY_TIMEOUT},
+    result_backend_transport_options={"visibility_timeout": CELERY_VISIBILITY_TIMEOUT},
 )
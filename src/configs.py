@@ -7,7 +7,46 @@ load_dotenv()
 
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = os.getenv("REDIS_PORT")
+CELERY_VISIBILITY_TIMEOUT = int(os.getenv("CELERY_VISIBILITY_TIMEOUT", 3600))
+CELERY_RESULT_EXPIRES = int(os.getenv("CELERY_RESULT_EXPIRES", 86400))
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///distribution.db")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 30))
 
 URL = os.getenv("URL")
 TOKEN = os.getenv("TOKEN")
 
+SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", 32))
+SEND_TIMEOUT = float(os.getenv("SEND_TIMEOUT", 10))
+SEND_CHUNK_SIZE = int(os.getenv("SEND_CHUNK_SIZE", 1000))
+SEND_MAX_PARALLELISM = int(os.getenv("SEND_MAX_PARALLELISM", 8))
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", 0))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 10))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", 30))
+BREAKER_MAX_OPEN = float(os.getenv("BREAKER_MAX_OPEN", 120))
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", 5))
+SEND_RETRY_BACKOFF = float(os.getenv("SEND_RETRY_BACKOFF", 30))
+SEND_RETRY_BACKOFF_MAX = float(os.getenv("SEND_RETRY_BACKOFF_MAX", 3600))
+MESSAGE_LEASE_SECONDS = int(os.getenv("MESSAGE_LEASE_SECONDS", 600))
+DISTRIBUTION_LEASE_SECONDS = int(os.getenv("DISTRIBUTION_LEASE_SECONDS", 900))
+STATUS_FLUSH_SIZE = int(os.getenv("STATUS_FLUSH_SIZE", 500))
+STATUS_FLUSH_INTERVAL_MS = int(os.getenv("STATUS_FLUSH_INTERVAL_MS", 500))
+EMBEDDED_SCHEDULER = os.getenv("EMBEDDED_SCHEDULER", "true").lower() in ("1", "true", "yes")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 4))
+SCHEDULER_CHECK_INTERVAL = float(os.getenv("SCHEDULER_CHECK_INTERVAL", 15))
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 100))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 1000))
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", 9808))
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", 10000))
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", 30))
+READ_CACHE_REDIS = os.getenv("READ_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+AUDIENCE_CACHE_SIZE = int(os.getenv("AUDIENCE_CACHE_SIZE", 1024))
+AUDIENCE_CACHE_TTL = float(os.getenv("AUDIENCE_CACHE_TTL", 300))
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", 30))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 5000))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
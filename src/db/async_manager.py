@@ -0,0 +1,197 @@
+from typing import AsyncIterator, Dict, List, Type
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from configs import PAGE_SIZE, STREAM_BATCH_SIZE
+from db.engine import get_async_engine
+from db.manager import DataManager
+from db.models import Base, Distribution, Client
+from db.queries import ALL_TAGS, ALL_OPERATORS, page, messages_cnt, detailed_messages, group_messages, \
+    new_distribution, new_client, apply_updates, split_filter, audience_count, distribution_counts, counter_updates, \
+    client_message_counts, forgotten_counts, is_updatable
+from metrics import instrument
+from services.validation import NewDistribution, NewClient, UpdateClient, UpdateDistribution, DistributionOut, \
+    ClientOut
+
+
+@instrument
+class AsyncDataManager:
+    def __init__(self, data_manager: DataManager, engine: AsyncEngine | None = None):
+        self.data_manager = data_manager
+        self.session_maker = async_sessionmaker(engine or get_async_engine(), expire_on_commit=False)
+        self.distributions = AsyncDistributionsManager(self)
+        self.clients = AsyncClientsManager(self)
+
+    async def stream(self, model: Type[Base]) -> AsyncIterator[List[Dict]]:
+        async with self.session_maker() as session:
+            result = await session.stream(
+                select(model.__table__).order_by(model.id).execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for rows in result.mappings().partitions():
+                yield [dict(row) for row in rows]
+
+    async def get_stat(self) -> Dict:
+        async with self.session_maker() as session:
+            distributions = (await session.scalars(select(Distribution))).all()
+            return {
+                "total_dist_cnt": len(distributions),
+                "distributions": [
+                    {"distribution": distribution, "messages_cnt": messages_cnt(distribution_counts(distribution))}
+                    for distribution in distributions
+                ],
+            }
+
+
+@instrument
+class AsyncDistributionsManager:
+    def __init__(self, parent: AsyncDataManager):
+        self.parent = parent
+        self.session_maker = parent.session_maker
+
+    async def get_by_id(self, dist_id: int) -> Distribution | None:
+        async with self.session_maker() as session:
+            return await session.get(Distribution, dist_id)
+
+    async def get_cached(self, dist_id: int) -> DistributionOut | None:
+        cache = self.parent.data_manager.distribution_cache
+        cached = await run_in_threadpool(cache.get, dist_id)
+        if cached is None:
+            distribution = await self.get_by_id(dist_id)
+            if distribution is None:
+                return None
+            cached = DistributionOut.model_validate(distribution)
+            await run_in_threadpool(cache.set, dist_id, cached)
+        return cached
+
+    async def get_page(self, after_id: int | None = None, limit: int = PAGE_SIZE) -> List[Dict]:
+        async with self.session_maker() as session:
+            return [dict(row) for row in (await session.execute(page(Distribution, after_id, limit))).mappings()]
+
+    async def stream_all(self) -> AsyncIterator[List[Dict]]:
+        async for rows in self.parent.stream(Distribution):
+            yield rows
+
+    async def add(self, distribution: NewDistribution) -> int:
+        async with self.session_maker() as session:
+            created = new_distribution(distribution)
+            session.add(created)
+            await session.commit()
+            dist_id = created.id
+        await run_in_threadpool(self.parent.data_manager.notify_distribution_changed, dist_id)
+        return dist_id
+
+    async def update(self, dist_id: int, updated_params: UpdateDistribution) -> bool:
+        async with self.session_maker() as session:
+            distribution = await session.get(Distribution, dist_id)
+            if not is_updatable(distribution, updated_params):
+                return False
+            apply_updates(distribution, updated_params)
+            await session.commit()
+        await run_in_threadpool(self.parent.data_manager.distribution_cache.invalidate, dist_id)
+        await run_in_threadpool(self.parent.data_manager.notify_distribution_changed, dist_id)
+        return True
+
+    async def delete(self, dist_id: int) -> bool:
+        async with self.session_maker() as session:
+            distribution = await session.get(Distribution, dist_id)
+            if distribution is None:
+                return False
+            await session.delete(distribution)
+            await session.commit()
+        await run_in_threadpool(self.parent.data_manager.distribution_cache.invalidate, distribution.id)
+        await run_in_threadpool(self.parent.data_manager.notify_distribution_changed, dist_id)
+        return True
+
+    async def get_stat(self, dist_id: int, detailed=False, status: str | None = None, cursor: int | None = None,
+                       limit: int = 100) -> Dict | bool:
+        stat = {}
+        async with self.session_maker() as session:
+            distribution = await session.get(Distribution, dist_id)
+            if distribution is None:
+                return False
+            stat["distribution"] = distribution
+            stat["messages_cnt"] = messages_cnt(distribution_counts(distribution))
+            if detailed:
+                rows = (await session.execute(detailed_messages(
+                    dist_id, status, cursor, limit, archived=distribution.archived_at is not None))).all()
+                stat["messages"], stat["next_cursor"] = group_messages(rows, limit)
+        return stat
+
+
+@instrument
+class AsyncClientsManager:
+    def __init__(self, parent: AsyncDataManager):
+        self.parent = parent
+        self.session_maker = parent.session_maker
+
+    async def get_by_id(self, client_id: int) -> Client | None:
+        async with self.session_maker() as session:
+            return await session.get(Client, client_id)
+
+    async def get_cached(self, client_id: int) -> ClientOut | None:
+        cache = self.parent.data_manager.client_cache
+        cached = await run_in_threadpool(cache.get, client_id)
+        if cached is None:
+            client = await self.get_by_id(client_id)
+            if client is None:
+                return None
+            cached = ClientOut.model_validate(client)
+            await run_in_threadpool(cache.set, client_id, cached)
+        return cached
+
+    async def get_page(self, after_id: int | None = None, limit: int = PAGE_SIZE) -> List[Dict]:
+        async with self.session_maker() as session:
+            return [dict(row) for row in (await session.execute(page(Client, after_id, limit))).mappings()]
+
+    async def stream_all(self) -> AsyncIterator[List[Dict]]:
+        async for rows in self.parent.stream(Client):
+            yield rows
+
+    async def add(self, client: NewClient):
+        async with self.session_maker() as session:
+            session.add(new_client(client))
+            await session.commit()
+        await run_in_threadpool(self.parent.data_manager.audience.invalidate, [(client.tag, client.mobile_operator)])
+
+    async def add_many(self, clients: List[Dict]):
+        async with self.session_maker() as session:
+            await session.execute(insert(Client), clients)
+            await session.commit()
+        await run_in_threadpool(self.parent.data_manager.audience.invalidate,
+                                [(client.get("tag"), client.get("mobile_operator")) for client in clients])
+
+    async def count_audience(self, filter_tag: str = ALL_TAGS, filter_mobile_operator: str = ALL_OPERATORS) -> int:
+        key = split_filter(filter_tag, ALL_TAGS), split_filter(filter_mobile_operator, ALL_OPERATORS)
+        count = self.parent.data_manager.audience.get(key)
+        if count is None:
+            async with self.session_maker() as session:
+                count = await session.scalar(audience_count(*key))
+            self.parent.data_manager.audience.set(key, count)
+        return count
+
+    async def update(self, client_id: int, updated_params: UpdateClient) -> bool:
+        async with self.session_maker() as session:
+            client = await session.get(Client, client_id)
+            if client is None:
+                return False
+            segment = client.tag, client.mobile_operator
+            apply_updates(client, updated_params)
+            await session.commit()
+        await run_in_threadpool(self.parent.data_manager.audience.invalidate,
+                                [segment, (client.tag, client.mobile_operator)])
+        await run_in_threadpool(self.parent.data_manager.client_cache.invalidate, client_id)
+        return True
+
+    async def delete(self, client_id: int) -> bool:
+        async with self.session_maker() as session:
+            client = await session.get(Client, client_id)
+            if client is None:
+                return False
+            for statement in counter_updates(forgotten_counts(await session.execute(client_message_counts(client.id)))):
+                await session.execute(statement)
+            await session.delete(client)
+            await session.commit()
+        await run_in_threadpool(self.parent.data_manager.audience.invalidate, [(client.tag, client.mobile_operator)])
+        await run_in_threadpool(self.parent.data_manager.client_cache.invalidate, client.id)
+        return True
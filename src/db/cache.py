@@ -0,0 +1,152 @@
+import logging
+from collections import OrderedDict
+from threading import Lock, Thread
+from time import monotonic
+from typing import Callable, Dict, Generic, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+from redis import Redis, RedisError
+
+from configs import READ_CACHE_SIZE, READ_CACHE_TTL
+from metrics import CACHE_REQUESTS
+from redis_conf import listen
+
+logger = logging.getLogger("read_cache")
+
+Model = TypeVar("Model", bound=BaseModel)
+
+INVALIDATION_CHANNEL = "cache:invalidated"
+ALL_KEYS = "*"
+
+
+class InvalidationBus:
+    def __init__(self, redis: Callable[[], Redis], channel: str = INVALIDATION_CHANNEL):
+        self.channel = channel
+        self._redis = redis
+        self._caches: Dict[str, "ReadCache"] = {}
+        self._listener: Thread | None = None
+        self._lock = Lock()
+
+    def register(self, cache):
+        self._caches[cache.name] = cache
+
+    def publish(self, name: str, key: int | str):
+        try:
+            self._redis().publish(self.channel, f"{name}:{key}")
+        except RedisError as exc:
+            logger.warning(f"Publishing {name} cache invalidation failed: {exc}")
+
+    def listen(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = listen(self.channel, self._receive, self._clear, self._redis)
+
+    def _receive(self, data: bytes):
+        name, _, key = data.decode().partition(":")
+        cache = self._caches.get(name)
+        if cache is None:
+            return
+        if key == ALL_KEYS:
+            cache.clear()
+        else:
+            cache.discard(int(key))
+
+    def _clear(self):
+        for cache in self._caches.values():
+            cache.clear()
+
+
+class ReadCache(Generic[Model]):
+    def __init__(self, name: str, model: Type[Model], max_size: int = READ_CACHE_SIZE, ttl: float = READ_CACHE_TTL,
+                 redis: Callable[[], Redis] | None = None, bus: InvalidationBus | None = None):
+        self.name = name
+        self.model = model
+        self.max_size = max_size
+        self.ttl = ttl
+        self._redis = redis
+        self._bus = bus
+        self._entries: OrderedDict[int, Tuple[float, Model]] = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        if bus is not None:
+            bus.register(self)
+
+    def get(self, key: int) -> Model | None:
+        if self._bus is not None:
+            self._bus.listen()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.labels(self.name, "hit").inc()
+                return entry[1]
+        value = self._get_shared(key)
+        if value is not None:
+            self._store(key, value)
+            self.redis_hits += 1
+            CACHE_REQUESTS.labels(self.name, "redis_hit").inc()
+            return value
+        self.misses += 1
+        CACHE_REQUESTS.labels(self.name, "miss").inc()
+        return None
+
+    def set(self, key: int, value: Model):
+        self._store(key, value)
+        if self._redis is not None:
+            try:
+                self._redis().set(self._key(key), value.model_dump_json(), ex=max(1, int(self.ttl)))
+            except RedisError as exc:
+                logger.warning(f"Shared {self.name} cache write failed: {exc}")
+
+    def invalidate(self, key: int):
+        self.discard(key)
+        if self._redis is not None:
+            try:
+                self._redis().delete(self._key(key))
+            except RedisError as exc:
+                logger.warning(f"Shared {self.name} cache invalidation failed: {exc}")
+        if self._bus is not None:
+            self._bus.publish(self.name, key)
+
+    def discard(self, key: int):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        requests = self.hits + self.redis_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.redis_hits) / requests if requests else 0.0,
+        }
+
+    def _store(self, key: int, value: Model):
+        with self._lock:
+            self._entries[key] = monotonic() + self.ttl, value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, key: int) -> Model | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis().get(self._key(key))
+        except RedisError as exc:
+            logger.warning(f"Shared {self.name} cache read failed: {exc}")
+            return None
+        return None if raw is None else self.model.model_validate_json(raw)
+
+    def _key(self, key: int) -> str:
+        return f"cache:{self.name}:{key}"
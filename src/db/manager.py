@@ -1,30 +1,66 @@
 import datetime
-from typing import Dict, List, Type
+from typing import Callable, Dict, List, Type
 
+from sqlalchemy import select, insert, update, delete, case, func, literal, Row, Engine
+from redis import Redis
 from sqlalchemy.orm import sessionmaker, Query
 
-from db.models import Base, engine, Distribution, Client, Message
-from services.validation import NewDistribution, NewClient, UpdateClient, UpdateDistribution
+from configs import MESSAGE_LEASE_SECONDS, DISTRIBUTION_LEASE_SECONDS, SEND_MAX_ATTEMPTS, READ_CACHE_REDIS
+from db.cache import InvalidationBus, ReadCache
+from db.engine import get_engine
+from db.models import Distribution, Client, Message
+from db.queries import PENDING_STATUSES, ALL_TAGS, ALL_OPERATORS, due_messages, stale_messages, \
+    claimable_messages, next_attempt_at, failed_status, messages_cnt, detailed_messages, group_messages, \
+    new_distribution, new_client, apply_updates, split_filter, audience_filter, audience_count, counter_deltas, \
+    counter_updates, distribution_counts, client_message_counts, forgotten_counts, archivable_distributions, \
+    archive_messages, audience_time_zones, is_updatable
+from metrics import instrument
+from services.audience import AudienceCache
+from redis_conf import get_redis
+from services.validation import NewDistribution, NewClient, UpdateClient, UpdateDistribution, DistributionOut, \
+    ClientOut
 
 
+@instrument
 class DataManager:
-    def __init__(self):
-        Base.metadata.create_all(engine)
-        self.session_maker = sessionmaker(engine)
+    def __init__(self, engine: Engine | None = None, redis: Callable[[], Redis] | None = get_redis):
+        self.session_maker = sessionmaker(engine or get_engine())
+        self.invalidations = InvalidationBus(redis) if redis is not None else None
+        self.audience = AudienceCache(bus=self.invalidations)
+        shared_cache = redis if READ_CACHE_REDIS else None
+        self.distribution_cache = ReadCache("distribution", DistributionOut, redis=shared_cache, bus=self.invalidations)
+        self.client_cache = ReadCache("client", ClientOut, redis=shared_cache, bus=self.invalidations)
         self.distributions = DistributionsManager(self)
         self.clients = ClientsManager(self)
         self.messages = MessagesManager(self)
+        self._listeners: List[Callable[[int], None]] = []
+
+    def subscribe(self, listener: Callable[[int], None]):
+        self._listeners.append(listener)
+
+    def notify_distribution_changed(self, dist_id: int):
+        for listener in self._listeners:
+            listener(dist_id)
+
+    def get_cache_stat(self) -> Dict:
+        return {"distribution": self.distribution_cache.stats(), "client": self.client_cache.stats()}
 
     def get_stat(self, detailed: bool = False) -> Dict:
         stat = {}
         with self.session_maker() as session:
-            distributions = [vars(dist) for dist in session.query(Distribution).all()]
+            distributions = session.query(Distribution).all()
             stat["total_dist_cnt"] = len(distributions)
             stat["distributions"] = []
             for distribution in distributions:
-                result = self.distributions.get_stat(distribution["id"], detailed)
-                if result is not False:
-                    stat["distributions"].append(result)
+                if detailed:
+                    result = self.distributions.get_stat(distribution.id, detailed)
+                    if result is not False:
+                        stat["distributions"].append(result)
+                else:
+                    stat["distributions"].append({
+                        "distribution": distribution,
+                        "messages_cnt": messages_cnt(distribution_counts(distribution))
+                    })
             return stat
 
     def manage_status(self, dist_id: int) -> str | None:
@@ -34,17 +70,16 @@ class DataManager:
                 return distribution
             if distribution.status in ["finished", "created"]:
                 return distribution.status
-            messages = self.messages.get_distribution_messages(distribution.id)
-            new_status = "finished"
-            for message in messages:
-                if message.status == "created":
-                    new_status = "unfinished"
+            counts = distribution_counts(distribution)
+            new_status = "unfinished" if any(counts[status] for status in PENDING_STATUSES) else "finished"
             distribution.status = new_status
             session.commit()
             session.close()
-            return new_status
+        self.distribution_cache.invalidate(dist_id)
+        return new_status
 
 
+@instrument
 class DistributionsManager:
     def __init__(self, parent: DataManager):
         self.parent = parent
@@ -54,40 +89,38 @@ class DistributionsManager:
         with self.session_maker() as session:
             return session.get(Distribution, dist_id)
 
-    def get_all(self) -> List:
+    def get_cached(self, dist_id: int) -> DistributionOut | None:
+        cached = self.parent.distribution_cache.get(dist_id)
+        if cached is None:
+            distribution = self.get_by_id(dist_id)
+            if distribution is None:
+                return None
+            cached = DistributionOut.model_validate(distribution)
+            self.parent.distribution_cache.set(dist_id, cached)
+        return cached
+
+    def get_all(self) -> List[Dict]:
         with self.session_maker() as session:
-            return [vars(dist) for dist in session.query(Distribution).all()]
+            return [dict(row) for row in session.execute(select(Distribution.__table__)).mappings()]
 
-    def add(self, distribution: NewDistribution):
+    def add(self, distribution: NewDistribution) -> int:
         with self.session_maker() as session:
-            session.add(Distribution(
-                start_date=distribution.start_date,
-                end_date=distribution.end_date,
-                filter_mobile_operator=distribution.filter_mobile_operator,
-                filter_tag=distribution.filter_tag,
-                text=distribution.text,
-                name=distribution.name
-            ))
+            created = new_distribution(distribution)
+            session.add(created)
             session.commit()
+            dist_id = created.id
+        self.parent.notify_distribution_changed(dist_id)
+        return dist_id
 
     def update(self, dist_id, updated_params: UpdateDistribution) -> bool:
         with self.session_maker() as session:
             distribution = session.get(Distribution, dist_id)
-            if distribution is None or distribution.status not in ["created", "unfinished"]:
+            if not is_updatable(distribution, updated_params):
                 return False
-            if updated_params.name is not None:
-                distribution.name = updated_params.name
-            if updated_params.start_date is not None:
-                distribution.start_date = updated_params.start_date
-            if updated_params.end_date is not None:
-                distribution.end_date = updated_params.end_date
-            if updated_params.filter_tag is not None:
-                distribution.filter_tag = updated_params.filter_tag
-            if updated_params.filter_mobile_operator is not None:
-                distribution.filter_mobile_operator = updated_params.filter_mobile_operator
-            if updated_params.text is not None:
-                distribution.text = updated_params.text
+            apply_updates(distribution, updated_params)
             session.commit()
+        self.parent.distribution_cache.invalidate(dist_id)
+        self.parent.notify_distribution_changed(dist_id)
         return True
 
     def delete(self, dist_id: int) -> bool:
@@ -95,80 +128,109 @@ class DistributionsManager:
             dist = session.get(Distribution, dist_id)
             if dist is None:
                 return False
+            dist_id = dist.id
             session.delete(dist)
             session.commit()
+        self.parent.distribution_cache.invalidate(dist_id)
+        self.parent.notify_distribution_changed(dist_id)
         return True
 
-    def get_stat(self, dist_id: int, detailed=False) -> Dict | bool:
+    def get_stat(self, dist_id: int, detailed=False, status: str | None = None, cursor: int | None = None,
+                 limit: int = 100) -> Dict | bool:
         stat = {}
         with self.session_maker() as session:
             distribution: Distribution | None = session.get(Distribution, dist_id)
             if distribution is None:
                 return False
             stat["distribution"] = distribution
-            total_messages = [vars(message) for message in session.query(Message).filter(
-                Message.distribution_id == dist_id)]
-            stat["messages_cnt"] = {}
-            stat["messages_cnt"]["total"] = len(total_messages)
-            stat["messages_cnt"]["created"] = len(list(filter(
-                lambda message: message["status"] == "created", total_messages)))
-            stat["messages_cnt"]["sent"] = len(
-                list(filter(lambda message: message["status"] == "sent", total_messages)))
+            stat["messages_cnt"] = messages_cnt(distribution_counts(distribution))
             if detailed:
-                stat["messages"] = {}
-                stat["messages"]["created"] = list(filter(
-                    lambda message: message["status"] == "created", total_messages))
-                for message in stat["messages"]["created"]:
-                    message["client"] = self.parent.clients.get_by_id(message["client_id"])
-                stat["messages"]["sent"] = list(filter(lambda message: message["status"] == "sent", total_messages))
-                for message in stat["messages"]["sent"]:
-                    message["client"] = self.parent.clients.get_by_id(message["client_id"])
+                rows = session.execute(detailed_messages(
+                    dist_id, status, cursor, limit, archived=distribution.archived_at is not None)).all()
+                stat["messages"], stat["next_cursor"] = group_messages(rows, limit)
         return stat
 
     def mark_distribution_expired(self, distribution_id: int):
+        self._set_status(distribution_id, "expired")
+
+    def mark_distribution_started(self, distribution_id: int):
+        with self.session_maker() as session:
+            session.execute(update(Distribution).where(Distribution.id == distribution_id).values(
+                status="started",
+                lease_expires_at=datetime.datetime.now() + datetime.timedelta(seconds=DISTRIBUTION_LEASE_SECONDS)))
+            session.commit()
+        self.parent.distribution_cache.invalidate(distribution_id)
+
+    def renew_lease(self, distribution_id: int):
         with self.session_maker() as session:
-            distribution = self.get_by_id(distribution_id)
+            session.execute(update(Distribution).where(Distribution.id == distribution_id).values(
+                lease_expires_at=datetime.datetime.now() + datetime.timedelta(seconds=DISTRIBUTION_LEASE_SECONDS)))
+            session.commit()
+        self.parent.distribution_cache.invalidate(distribution_id)
+
+    def _set_status(self, distribution_id: int, status: str):
+        with self.session_maker() as session:
+            distribution = session.get(Distribution, distribution_id)
             if distribution is not None:
-                distribution.status = "expired"
+                distribution.status = status
                 session.commit()
+        self.parent.distribution_cache.invalidate(distribution_id)
 
 
+@instrument
 class ClientsManager:
-    def __init__(self, parent):
+    def __init__(self, parent: DataManager):
+        self.parent = parent
         self.session_maker = parent.session_maker
 
     def get_by_id(self, client_id: int) -> Client:
         with self.session_maker() as session:
             return session.get(Client, client_id)
 
+    def get_cached(self, client_id: int) -> ClientOut | None:
+        cached = self.parent.client_cache.get(client_id)
+        if cached is None:
+            client = self.get_by_id(client_id)
+            if client is None:
+                return None
+            cached = ClientOut.model_validate(client)
+            self.parent.client_cache.set(client_id, cached)
+        return cached
+
     def add(self, client: NewClient):
         with self.session_maker() as session:
-            session.add(Client(
-                phone_number=client.phone_number,
-                mobile_operator=client.mobile_operator,
-                time_zone=client.time_zone,
-                tag=client.tag
-            ))
+            session.add(new_client(client))
             session.commit()
+        self.parent.audience.invalidate([(client.tag, client.mobile_operator)])
+
+    def count_audience(self, filter_tag: str = ALL_TAGS, filter_mobile_operator: str = ALL_OPERATORS) -> int:
+        key = split_filter(filter_tag, ALL_TAGS), split_filter(filter_mobile_operator, ALL_OPERATORS)
+        count = self.parent.audience.get(key)
+        if count is None:
+            with self.session_maker() as session:
+                count = session.scalar(audience_count(*key))
+            self.parent.audience.set(key, count)
+        return count
 
     def get_all(self) -> List[Dict]:
         with self.session_maker() as session:
-            return [vars(client) for client in session.query(Client).all()]
+            return [dict(row) for row in session.execute(select(Client.__table__)).mappings()]
+
+    def get_audience_time_zones(self, filter_tag: str | None, filter_mobile_operator: str | None) -> List[str]:
+        with self.session_maker() as session:
+            return list(session.scalars(audience_time_zones(
+                split_filter(filter_tag, ALL_TAGS), split_filter(filter_mobile_operator, ALL_OPERATORS))))
 
     def update(self, client_id: int, updated_params: UpdateClient):
         with self.session_maker() as session:
             client = session.get(Client, client_id)
             if client is None:
                 return False
-            if updated_params.phone_number is not None:
-                client.phone_number = updated_params.phone_number
-            if updated_params.mobile_operator is not None:
-                client.mobile_operator = updated_params.mobile_operator
-            if updated_params.tag is not None:
-                client.tag = updated_params.tag
-            if updated_params.time_zone is not None:
-                client.time_zone = updated_params.time_zone
+            segment = client.tag, client.mobile_operator
+            apply_updates(client, updated_params)
             session.commit()
+            self.parent.audience.invalidate([segment, (client.tag, client.mobile_operator)])
+        self.parent.client_cache.invalidate(client_id)
         return True
 
     def delete(self, client_id: int):
@@ -176,11 +238,18 @@ class ClientsManager:
             cli = session.get(Client, client_id)
             if cli is None:
                 return False
+            segment = cli.tag, cli.mobile_operator
+            cli_id = cli.id
+            for statement in counter_updates(forgotten_counts(session.execute(client_message_counts(cli_id)))):
+                session.execute(statement)
             session.delete(cli)
             session.commit()
+        self.parent.audience.invalidate([segment])
+        self.parent.client_cache.invalidate(cli_id)
         return True
 
 
+@instrument
 class MessagesManager:
 
     def __init__(self, parent: DataManager):
@@ -197,28 +266,137 @@ class MessagesManager:
             messages = session.query(Message).where(Message.distribution_id == dist_id)
             return messages
 
+    def get_pending_message_ids(self, dist_id: int, time_zones: List[str] | None = None) -> List[int]:
+        query = select(Message.id).where(
+            (Message.distribution_id == dist_id) & claimable_messages(datetime.datetime.now()))
+        if time_zones is not None:
+            query = query.join(Client).where(Client.time_zone.in_(time_zones))
+        with self.session_maker() as session:
+            return list(session.scalars(query.order_by(Message.id)))
+
+    def get_pending_time_zones(self, dist_id: int) -> List[str]:
+        with self.session_maker() as session:
+            return list(session.scalars(
+                select(Client.time_zone).join(Message)
+                .where((Message.distribution_id == dist_id) & Message.status.in_(PENDING_STATUSES))
+                .group_by(Client.time_zone)))
+
+    def get_time_zones(self, message_ids: List[int]) -> List[str]:
+        with self.session_maker() as session:
+            return list(session.scalars(
+                select(Client.time_zone).join(Message).where(Message.id.in_(message_ids)).group_by(Client.time_zone)))
+
+    def count_pending(self, dist_id: int) -> int:
+        with self.session_maker() as session:
+            return session.scalar(
+                select(Distribution.messages_created + Distribution.messages_sending)
+                .where(Distribution.id == dist_id)) or 0
+
+    def count_pending_by_distribution(self) -> Dict[int, int]:
+        with self.session_maker() as session:
+            return dict(session.execute(
+                select(Distribution.id, Distribution.messages_created + Distribution.messages_sending)
+                .where(Distribution.status.not_in(["finished", "expired"]))).all())
+
+    def get_next_attempt_at(self, dist_id: int) -> datetime.datetime | None:
+        now = datetime.datetime.now()
+        with self.session_maker() as session:
+            return session.scalar(
+                select(func.min(func.coalesce(Message.next_attempt_at, Message.lease_expires_at, now)))
+                .where((Message.distribution_id == dist_id) & Message.status.in_(PENDING_STATUSES)))
+
+    def claim_messages(self, message_ids: List[int], time_zones: List[str] | None = None) -> List[Row]:
+        now = datetime.datetime.now()
+        claim = dict(status="sending", attempts=Message.attempts + 1, next_attempt_at=None,
+                     lease_expires_at=now + datetime.timedelta(seconds=MESSAGE_LEASE_SECONDS))
+        claimed_ids = Message.id.in_(message_ids)
+        if time_zones is not None:
+            claimed_ids &= Message.client_id.in_(select(Client.id).where(Client.time_zone.in_(time_zones)))
+        with self.session_maker() as session:
+            due = session.execute(
+                update(Message).where(claimed_ids & due_messages(now)).values(**claim)
+                .returning(Message.id, Message.distribution_id)).all()
+            stale = session.scalars(
+                update(Message).where(claimed_ids & stale_messages(now)).values(**claim)
+                .returning(Message.id)).all()
+            for statement in counter_updates(counter_deltas(
+                    (distribution_id, "created", "sending") for _, distribution_id in due)):
+                session.execute(statement)
+            session.commit()
+            claimed = [message_id for message_id, _ in due] + list(stale)
+            if not claimed:
+                return []
+            return session.execute(
+                select(Message.id, Client.phone_number).join(Client)
+                .where(Message.id.in_(claimed))
+                .order_by(Message.id)).all()
+
+    def fail_messages(self, errors: Dict[int, str]):
+        if not errors:
+            return
+        now = datetime.datetime.now()
+        with self.session_maker() as session:
+            failed = session.execute(
+                update(Message).where(Message.id.in_(list(errors)) & (Message.status == "sending"))
+                .values(status=failed_status(), next_attempt_at=next_attempt_at(now), lease_expires_at=None,
+                        last_error=case(errors, value=Message.id))
+                .returning(Message.distribution_id, Message.attempts)
+                .execution_options(synchronize_session=False)).all()
+            for statement in counter_updates(counter_deltas(
+                    (distribution_id, "sending", "failed" if attempt >= SEND_MAX_ATTEMPTS else "created")
+                    for distribution_id, attempt in failed)):
+                session.execute(statement)
+            session.commit()
+
+    def fail_expired_leases(self, dist_id: int):
+        with self.session_maker() as session:
+            expired = session.execute(update(Message).where(
+                (Message.distribution_id == dist_id) & (Message.status == "sending")
+                & (Message.lease_expires_at < datetime.datetime.now()) & (Message.attempts >= SEND_MAX_ATTEMPTS)
+            ).values(status="failed", lease_expires_at=None, last_error="Lease expired")).rowcount
+            for statement in counter_updates({dist_id: {"sending": -expired, "failed": expired}}):
+                session.execute(statement)
+            session.commit()
+
     def mark_message_sent(self, message_id):
+        self.mark_messages_sent([message_id])
+
+    def mark_messages_sent(self, message_ids: List[int]):
+        if not message_ids:
+            return
         with self.session_maker() as session:
-            message = session.get(Message, message_id)
-            message.status = "sent"
-            message.sending_time = datetime.datetime.now()
+            sent = session.scalars(
+                update(Message).where(Message.id.in_(message_ids) & (Message.status == "sending"))
+                .values(status="sent", sending_time=datetime.datetime.now(), lease_expires_at=None)
+                .returning(Message.distribution_id)).all()
+            for statement in counter_updates(counter_deltas(
+                    (distribution_id, "sending", "sent") for distribution_id in sent)):
+                session.execute(statement)
             session.commit()
 
+    def archive(self, cutoff: datetime.datetime) -> List[int]:
+        with self.session_maker() as session:
+            dist_ids = list(session.scalars(archivable_distributions(cutoff)))
+        for dist_id in dist_ids:
+            with self.session_maker() as session:
+                session.execute(archive_messages(dist_id))
+                session.execute(delete(Message).where(Message.distribution_id == dist_id))
+                session.execute(update(Distribution).where(Distribution.id == dist_id)
+                                .values(archived_at=datetime.datetime.now()))
+                session.commit()
+            self.parent.distribution_cache.invalidate(dist_id)
+        return dist_ids
+
     def create_distribution_messages(self, dist_id: int):
         with self.session_maker() as session:
             distribution: Distribution | None = session.get(Distribution, dist_id)
             if distribution is None:
                 return
-            if distribution.filter_tag != "all" and distribution.filter_mobile_operator != "000":
-                clients = session.query(Client).where((Client.tag == distribution.filter_tag) & (
-                        Client.mobile_operator == distribution.filter_mobile_operator))
-            elif distribution.filter_tag != "all":
-                clients = session.query(Client).where(Client.tag == distribution.filter_tag)
-            elif distribution.filter_mobile_operator != "000":
-                clients = session.query(Client).where(Client.mobile_operator == distribution.filter_mobile_operator)
-            else:
-                clients = session.query(Client).all()
-            for client in clients:
-                session.add(Message(distribution_id=distribution.id, client_id=client.id))
+            clients = select(literal(distribution.id), Client.id).where(audience_filter(
+                split_filter(distribution.filter_tag, ALL_TAGS),
+                split_filter(distribution.filter_mobile_operator, ALL_OPERATORS)))
+            created = session.execute(insert(Message).from_select(["distribution_id", "client_id"], clients)).rowcount
+            distribution.messages_created += created
             distribution.status = "started"
             session.commit()
+        self.parent.distribution_cache.invalidate(dist_id)
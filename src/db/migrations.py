@@ -0,0 +1,180 @@
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, Connection, Engine, Integer, MetaData, Select, Table, func, inspect, insert, select, \
+    text, update
+from sqlalchemy.schema import CreateColumn
+
+from db.models import Base, Distribution, Client, Message, MessageArchive
+from db.queries import COUNTED_STATUSES, counter_column, counter_values, message_counts, group_counts
+
+logger = logging.getLogger("migrations")
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, nullable=False),
+)
+
+
+def _add_column(connection: Connection, column: Column):
+    table = column.table.name
+    if column.name in {existing["name"] for existing in inspect(connection).get_columns(table)}:
+        return
+    ddl = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+
+def _create_indexes(connection: Connection, *tables: Table):
+    for table in tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _rebuild_table(connection: Connection, table: Table, columns: List[str], rows: Callable[[Table], Select]):
+    metadata = MetaData()
+    for referred in {foreign_key.column.table for foreign_key in table.foreign_keys}:
+        referred.to_metadata(metadata)
+    rebuilt = table.to_metadata(metadata, name=f"{table.name}_rebuilt")
+    rebuilt.indexes.clear()
+    rebuilt.create(connection)
+    old = Table(table.name, MetaData(), autoload_with=connection)
+    connection.execute(insert(rebuilt).from_select(columns, rows(old)))
+    old.drop(connection)
+    connection.execute(text(f"ALTER TABLE {rebuilt.name} RENAME TO {table.name}"))
+    _create_indexes(connection, table)
+
+
+def initial_schema(connection: Connection):
+    Base.metadata.create_all(connection, tables=[Distribution.__table__, Client.__table__, Message.__table__],
+                             checkfirst=True)
+
+
+def distribution_sending_settings(connection: Connection):
+    _add_column(connection, Distribution.__table__.c.max_concurrency)
+    _add_column(connection, Distribution.__table__.c.chunk_size)
+    _add_column(connection, Distribution.__table__.c.max_parallelism)
+
+
+def query_indexes(connection: Connection):
+    _create_indexes(connection, Distribution.__table__, Client.__table__, Message.__table__)
+
+
+def send_leases(connection: Connection):
+    _add_column(connection, Distribution.__table__.c.lease_expires_at)
+    _add_column(connection, Message.__table__.c.lease_expires_at)
+
+
+def message_retries(connection: Connection):
+    _add_column(connection, Message.__table__.c.attempts)
+    _add_column(connection, Message.__table__.c.next_attempt_at)
+    _add_column(connection, Message.__table__.c.last_error)
+
+
+def distribution_rate_limit(connection: Connection):
+    _add_column(connection, Distribution.__table__.c.rate_limit)
+
+
+def rebuild_counters(connection: Connection, dist_id: int | None = None) -> List[int]:
+    table = Distribution.__table__
+    counts = group_counts(connection.execute(message_counts(dist_id)))
+    if inspect(connection).has_table(MessageArchive.__tablename__):
+        counts = {**group_counts(connection.execute(message_counts(dist_id, MessageArchive))), **counts}
+    query = select(table.c.id, *(counter_column(status) for status in COUNTED_STATUSES))
+    if dist_id is not None:
+        query = query.where(table.c.id == dist_id)
+    rebuilt = []
+    for row in connection.execute(query).mappings().all():
+        values = counter_values(counts.get(row["id"], {}))
+        if any(row[name] != value for name, value in values.items()):
+            connection.execute(update(table).where(table.c.id == row["id"]).values(values))
+            rebuilt.append(row["id"])
+    return rebuilt
+
+
+def message_counters(connection: Connection):
+    for status in COUNTED_STATUSES:
+        _add_column(connection, counter_column(status))
+    rebuild_counters(connection)
+
+
+def message_archive(connection: Connection):
+    _add_column(connection, Distribution.__table__.c.archived_at)
+    MessageArchive.__table__.create(connection, checkfirst=True)
+    _create_indexes(connection, MessageArchive.__table__)
+
+
+def archive_message_ids(connection: Connection):
+    table = MessageArchive.__table__
+    if "message_id" in {column["name"] for column in inspect(connection).get_columns(table.name)}:
+        return
+    columns = ["sending_time", "status", "attempts", "last_error", "distribution_id", "client_id"]
+    _rebuild_table(connection, table, ["message_id", *columns],
+                   lambda old: select(old.c.id, *(old.c[column] for column in columns)).order_by(old.c.id))
+
+
+def message_autoincrement(connection: Connection):
+    table = Message.__table__
+    if connection.dialect.name != "sqlite":
+        return
+    ddl = connection.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                            {"name": table.name})
+    if "AUTOINCREMENT" not in ddl.upper():
+        columns = [column["name"] for column in inspect(connection).get_columns(table.name)]
+        _rebuild_table(connection, table, columns,
+                       lambda old: select(*(old.c[column] for column in columns)).order_by(old.c.id))
+    last_id = max(connection.scalar(select(func.max(table.c.id))) or 0,
+                  connection.scalar(select(func.max(MessageArchive.__table__.c.message_id))) or 0,
+                  connection.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = :name"),
+                                    {"name": table.name}) or 0)
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+    connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                       {"name": table.name, "seq": last_id})
+
+
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, initial_schema),
+    (2, distribution_sending_settings),
+    (3, query_indexes),
+    (4, send_leases),
+    (5, message_retries),
+    (6, distribution_rate_limit),
+    (7, message_counters),
+    (8, message_archive),
+    (9, archive_message_ids),
+    (10, message_autoincrement),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(connection: Connection) -> int:
+    if not inspect(connection).has_table(schema_version.name):
+        return 0
+    return connection.scalar(select(schema_version.c.version)) or 0
+
+
+def migrate(engine: Engine, target: int = LATEST_VERSION) -> List[int]:
+    applied = []
+    with engine.begin() as connection:
+        schema_version.create(connection, checkfirst=True)
+        if connection.scalar(select(schema_version.c.version)) is None:
+            connection.execute(schema_version.insert().values(version=0))
+    for version, migration in MIGRATIONS:
+        if version > target:
+            break
+        with engine.begin() as connection:
+            if get_version(connection) >= version:
+                continue
+            migration(connection)
+            connection.execute(schema_version.update().values(version=version))
+        logger.info(f"Applied migration {version} {migration.__name__}")
+        applied.append(version)
+    return applied
+
+
+def check_schema(engine: Engine):
+    with engine.connect() as connection:
+        version = get_version(connection)
+    if version < LATEST_VERSION:
+        raise RuntimeError(f"Database schema version {version} is older than {LATEST_VERSION}, "
+                           f"run `python manage.py migrate`")
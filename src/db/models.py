@@ -3,10 +3,9 @@ from datetime import datetime
 from typing import Optional
 
 import pytz
-from sqlalchemy import create_engine, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Integer, Float, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, validates, relationship, Mapped, mapped_column
 
-engine = create_engine("sqlite:///distribution.db")
 Base = declarative_base()
 
 
@@ -20,6 +19,9 @@ class DistributionStatus(enum.Enum):
 
 class Distribution(Base):
     __tablename__ = "distribution"
+    __table_args__ = (
+        Index("ix_distribution_status", "status"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String, default="Distribution")
@@ -29,12 +31,26 @@ class Distribution(Base):
     filter_mobile_operator: Mapped[Optional[str]] = mapped_column(String, default="000")
     filter_tag: Mapped[Optional[str]] = mapped_column(String, default="all")
     status: Mapped[str] = mapped_column(String, default="created")
+    max_concurrency: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    chunk_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    max_parallelism: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    rate_limit: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    messages_created: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    messages_sending: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    messages_sent: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    messages_failed: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    archived_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     messages = relationship("Message", back_populates="distribution", cascade="save-update, merge, delete")
+    archived_messages = relationship("MessageArchive", cascade="save-update, merge, delete")
 
 
 class Client(Base):
     __tablename__ = "client"
+    __table_args__ = (
+        Index("ix_client_tag_mobile_operator", "tag", "mobile_operator"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     phone_number: Mapped[int] = mapped_column(Integer)
@@ -58,19 +74,44 @@ class Client(Base):
 
     @validates("time_zone")
     def validate_time_zone(self, _, value):
-        if value in pytz.all_timezones:
+        if value in pytz.all_timezones_set:
             return value
         raise ValueError("Time zone validation failed")
 
 
 class Message(Base):
     __tablename__ = "message"
+    __table_args__ = (
+        Index("ix_message_distribution_id_status", "distribution_id", "status"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     sending_time: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     status: Mapped[str] = mapped_column(String, default="created")
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     distribution_id: Mapped["Distribution"] = mapped_column(ForeignKey("distribution.id"))
     client_id: Mapped["Client"] = mapped_column(ForeignKey("client.id"))
 
     distribution: Mapped["Distribution"] = relationship(back_populates="messages")
     client: Mapped["Client"] = relationship(back_populates="messages")
+
+
+class MessageArchive(Base):
+    __tablename__ = "message_archive"
+    __table_args__ = (
+        Index("ix_message_archive_distribution_id_status", "distribution_id", "status"),
+        Index("ix_message_archive_distribution_id_message_id", "distribution_id", "message_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    message_id: Mapped[int] = mapped_column(Integer)
+    sending_time: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    status: Mapped[str] = mapped_column(String)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    distribution_id: Mapped[int] = mapped_column(ForeignKey("distribution.id"))
+    client_id: Mapped[int] = mapped_column(Integer)
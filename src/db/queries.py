@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import select, insert, update, func, case, null, true, Column, ColumnElement, Insert, Row, Select, \
+    Update
+
+from configs import SEND_MAX_ATTEMPTS, SEND_RETRY_BACKOFF, SEND_RETRY_BACKOFF_MAX
+
+from db.models import Base, Distribution, Client, Message, MessageArchive
+
+
+def page(model: Type[Base], after_id: int | None, limit: int) -> Select:
+    query = select(model.__table__)
+    if after_id is not None:
+        query = query.where(model.id > after_id)
+    return query.order_by(model.id).limit(limit)
+
+
+PENDING_STATUSES = ["created", "sending"]
+COUNTED_STATUSES = ["created", "sending", "sent", "failed"]
+ALL_TAGS = "all"
+ALL_OPERATORS = "000"
+AUDIENCE_FIELDS = ["filter_tag", "filter_mobile_operator"]
+
+
+def split_filter(value: str | None, wildcard: str) -> Tuple[str, ...]:
+    values = {item.strip() for item in (value or wildcard).split(",")} - {""}
+    return () if not values or wildcard in values else tuple(sorted(values))
+
+
+def audience_filter(tags: Tuple[str, ...], operators: Tuple[str, ...]) -> ColumnElement[bool]:
+    condition = true()
+    if tags:
+        condition &= Client.tag.in_(tags)
+    if operators:
+        condition &= Client.mobile_operator.in_(operators)
+    return condition
+
+
+def audience_time_zones(tags: Tuple[str, ...], operators: Tuple[str, ...]) -> Select:
+    return select(Client.time_zone).where(audience_filter(tags, operators)).group_by(Client.time_zone)
+
+
+def audience_count(tags: Tuple[str, ...], operators: Tuple[str, ...]) -> Select:
+    return select(func.count()).select_from(Client).where(audience_filter(tags, operators))
+
+
+def due_messages(now: datetime) -> ColumnElement[bool]:
+    return (Message.status == "created") & (Message.next_attempt_at.is_(None) | (Message.next_attempt_at <= now)) \
+        & (Message.attempts < SEND_MAX_ATTEMPTS)
+
+
+def stale_messages(now: datetime) -> ColumnElement[bool]:
+    return (Message.status == "sending") & (Message.lease_expires_at < now) & (Message.attempts < SEND_MAX_ATTEMPTS)
+
+
+def claimable_messages(now: datetime) -> ColumnElement[bool]:
+    return due_messages(now) | stale_messages(now)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(SEND_RETRY_BACKOFF * 2 ** (attempts - 1), SEND_RETRY_BACKOFF_MAX))
+
+
+def next_attempt_at(now: datetime) -> ColumnElement[datetime]:
+    retries = {attempts: now + retry_delay(attempts) for attempts in range(1, SEND_MAX_ATTEMPTS)}
+    return case(retries, value=Message.attempts, else_=null()) if retries else null()
+
+
+def failed_status() -> ColumnElement[str]:
+    return case((Message.attempts >= SEND_MAX_ATTEMPTS, "failed"), else_="created")
+
+
+def message_counts(dist_id: int | None = None, model: Type[Message] | Type[MessageArchive] = Message) -> Select:
+    query = select(model.distribution_id, model.status, func.count()) \
+        .group_by(model.distribution_id, model.status)
+    if dist_id is not None:
+        query = query.where(model.distribution_id == dist_id)
+    return query
+
+
+def group_counts(rows: Iterable[Row]) -> Dict[int, Dict[str, int]]:
+    counts = {}
+    for distribution_id, status, count in rows:
+        counts.setdefault(distribution_id, {})[status] = count
+    return counts
+
+
+def counter_column(status: str) -> Column:
+    return Distribution.__table__.c[f"messages_{status}"]
+
+
+def counter_deltas(moves: Iterable[Tuple[int, str | None, str | None]]) -> Dict[int, Dict[str, int]]:
+    deltas = {}
+    for distribution_id, old_status, new_status in moves:
+        counts = deltas.setdefault(distribution_id, {})
+        if old_status is not None:
+            counts[old_status] = counts.get(old_status, 0) - 1
+        if new_status is not None:
+            counts[new_status] = counts.get(new_status, 0) + 1
+    return deltas
+
+
+def counter_updates(deltas: Dict[int, Dict[str, int]]) -> List[Update]:
+    return [
+        update(Distribution.__table__).where(Distribution.__table__.c.id == distribution_id).values({
+            counter_column(status): counter_column(status) + delta for status, delta in counts.items() if delta
+        })
+        for distribution_id, counts in deltas.items()
+        if any(counts.values())
+    ]
+
+
+def counter_values(counts: Dict[str, int]) -> Dict[str, int]:
+    return {f"messages_{status}": counts.get(status, 0) for status in COUNTED_STATUSES}
+
+
+def distribution_counts(distribution: Distribution) -> Dict[str, int]:
+    return {status: getattr(distribution, f"messages_{status}") or 0 for status in COUNTED_STATUSES}
+
+
+def client_message_counts(client_id: int) -> Select:
+    return select(Message.distribution_id, Message.status, func.count()) \
+        .where(Message.client_id == client_id).group_by(Message.distribution_id, Message.status)
+
+
+def forgotten_counts(rows: Iterable[Row]) -> Dict[int, Dict[str, int]]:
+    return {
+        distribution_id: {status: -count for status, count in counts.items()}
+        for distribution_id, counts in group_counts(rows).items()
+    }
+
+
+def messages_cnt(counts: Dict[str, int]) -> Dict[str, int]:
+    return {
+        "total": sum(counts.values()),
+        "created": counts.get("created", 0),
+        "sent": counts.get("sent", 0),
+        "failed": counts.get("failed", 0),
+    }
+
+
+def detailed_messages(dist_id: int, status: str | None = None, cursor: int | None = None,
+                      limit: int = 100, archived: bool = False) -> Select:
+    model = MessageArchive if archived else Message
+    message_id = MessageArchive.message_id if archived else Message.id
+    query = select(model, Client, message_id.label("message_id")) \
+        .join(Client, model.client_id == Client.id, isouter=archived) \
+        .where(model.distribution_id == dist_id)
+    if status is not None:
+        query = query.where(model.status == status)
+    if cursor is not None:
+        query = query.where(message_id > cursor)
+    return query.order_by(message_id).limit(limit)
+
+
+def archivable_distributions(cutoff: datetime) -> Select:
+    return select(Distribution.id).where(
+        Distribution.status.in_(["finished", "expired"]) & Distribution.archived_at.is_(None)
+        & (Distribution.end_date < cutoff)).order_by(Distribution.id)
+
+
+def archive_messages(dist_id: int) -> Insert:
+    columns = ["sending_time", "status", "attempts", "last_error", "distribution_id", "client_id"]
+    return insert(MessageArchive).from_select(
+        ["message_id", *columns],
+        select(Message.id, *(getattr(Message, column) for column in columns))
+        .where(Message.distribution_id == dist_id).order_by(Message.id))
+
+
+def group_messages(rows: List[Row], limit: int) -> Tuple[Dict[str, List[Dict]], int | None]:
+    messages = {"created": [], "sent": []}
+    for message, client, message_id in rows:
+        messages.setdefault(message.status, []).append({
+            "id": message_id,
+            "distribution_id": message.distribution_id,
+            "client_id": message.client_id,
+            "status": message.status,
+            "sending_time": message.sending_time,
+            "attempts": message.attempts,
+            "last_error": message.last_error,
+            "client": client,
+        })
+    next_cursor = rows[-1].message_id if len(rows) == limit else None
+    return messages, next_cursor
+
+
+def new_distribution(distribution: BaseModel) -> Distribution:
+    return Distribution(**distribution.model_dump())
+
+
+def new_client(client: BaseModel) -> Client:
+    return Client(**client.model_dump())
+
+
+def is_updatable(distribution: Distribution | None, updated_params: BaseModel) -> bool:
+    if distribution is None or distribution.status not in ["created", "unfinished"]:
+        return False
+    if distribution.status == "created":
+        return True
+    changes = updated_params.model_dump(exclude_none=True)
+    return all(changes.get(field, getattr(distribution, field)) == getattr(distribution, field)
+               for field in AUDIENCE_FIELDS)
+
+
+def apply_updates(instance: Base, updated_params: BaseModel):
+    for field, value in updated_params.model_dump(exclude_none=True).items():
+        setattr(instance, field, value)
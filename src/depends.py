@@ -1,4 +1,19 @@
+from db.async_manager import AsyncDataManager
 from db.manager import DataManager
 
-data_manager = DataManager()
+_data_manager: DataManager | None = None
+_async_data_manager: AsyncDataManager | None = None
 
+
+def get_data_manager() -> DataManager:
+    global _data_manager
+    if _data_manager is None:
+        _data_manager = DataManager()
+    return _data_manager
+
+
+def get_async_data_manager() -> AsyncDataManager:
+    global _async_data_manager
+    if _async_data_manager is None:
+        _async_data_manager = AsyncDataManager(get_data_manager())
+    return _async_data_manager
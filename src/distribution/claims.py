@@ -0,0 +1,57 @@
+from datetime import datetime
+from time import monotonic
+from typing import Dict, Iterator, List
+
+from sqlalchemy import Row
+
+from configs import MESSAGE_LEASE_SECONDS, DISTRIBUTION_LEASE_SECONDS, SEND_TIMEOUT, STATUS_FLUSH_INTERVAL_MS
+from distribution import timezones
+
+
+def claim_batch_size(concurrency: int, rate: float | None, lease_seconds: float = MESSAGE_LEASE_SECONDS) -> int:
+    if not rate:
+        return concurrency
+    return max(1, min(concurrency, int(rate * lease_seconds / 10)))
+
+
+class ChunkClaims:
+    def __init__(self, data_manager, distribution_id: int, message_ids: List[int], batch_size: int,
+                 lease_seconds: float = MESSAGE_LEASE_SECONDS,
+                 margin: float = SEND_TIMEOUT + STATUS_FLUSH_INTERVAL_MS / 1000,
+                 renew_interval: float = DISTRIBUTION_LEASE_SECONDS / 3):
+        from db.manager import DataManager
+        self._data_manager: DataManager = data_manager
+        self.distribution_id = distribution_id
+        self.batch_size = batch_size
+        self._message_ids = message_ids
+        self._lease = lease_seconds - margin
+        self._renew_interval = renew_interval
+        self._deadlines: Dict[int, float] = {}
+        self._renewed_at: float | None = None
+
+    def __iter__(self) -> Iterator[Row]:
+        for start in range(0, len(self._message_ids), self.batch_size):
+            self.renew()
+            distribution = self._data_manager.distributions.get_by_id(self.distribution_id)
+            if distribution is None or distribution.status in ["finished", "expired"] \
+                    or timezones.latest_close(distribution.end_date) <= datetime.now():
+                return
+            batch = self._message_ids[start:start + self.batch_size]
+            time_zones = timezones.open_time_zones(self._data_manager.messages.get_time_zones(batch),
+                                                   distribution.start_date, distribution.end_date, timezones.utc_now())
+            if not time_zones:
+                continue
+            claimed_at = monotonic()
+            for message in self._data_manager.messages.claim_messages(batch, time_zones):
+                self._deadlines[message.id] = claimed_at + self._lease
+                yield message
+
+    def expired(self, message_id: int) -> bool:
+        self.renew()
+        return monotonic() >= self._deadlines.pop(message_id, 0)
+
+    def renew(self):
+        if self._renewed_at is not None and monotonic() - self._renewed_at < self._renew_interval:
+            return
+        self._data_manager.distributions.renew_lease(self.distribution_id)
+        self._renewed_at = monotonic()
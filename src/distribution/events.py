@@ -0,0 +1,22 @@
+import logging
+from threading import Thread
+from typing import Callable
+
+from redis import RedisError
+
+from redis_conf import get_redis, listen
+
+CHANNEL = "distribution:changed"
+
+logger = logging.getLogger("distribution_events")
+
+
+def publish_change(dist_id: int):
+    try:
+        get_redis().publish(CHANNEL, dist_id)
+    except RedisError as exc:
+        logger.warning(f"Publishing change of distribution {dist_id} failed: {exc}")
+
+
+def listen_changes(on_change: Callable[[int], None], on_subscribe: Callable[[], None]) -> Thread:
+    return listen(CHANNEL, lambda data: on_change(int(data)), on_subscribe)
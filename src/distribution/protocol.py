@@ -0,0 +1,57 @@
+from typing import Dict, Iterable, List, Tuple
+
+PROTOCOL_VERSION = 1
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def pack_ids(ids: Iterable[int]) -> List[List[int]]:
+    runs = []
+    for message_id in sorted(ids):
+        if runs and runs[-1][1] == message_id - 1:
+            runs[-1][1] = message_id
+        else:
+            runs.append([message_id, message_id])
+    return runs
+
+
+def unpack_ids(runs: List[List[int]]) -> List[int]:
+    return [message_id for first, last in runs for message_id in range(first, last + 1)]
+
+
+def _check_version(payload: Dict) -> Dict:
+    if not isinstance(payload, dict) or payload.get("v") != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported task payload: {payload!r}")
+    if not _is_int(payload.get("d")):
+        raise ProtocolError(f"Task payload has no distribution id: {payload!r}")
+    return payload
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_run(run) -> bool:
+    return isinstance(run, list) and len(run) == 2 and all(map(_is_int, run)) and run[0] <= run[1]
+
+
+def distribution_payload(distribution_id: int) -> Dict:
+    return {"v": PROTOCOL_VERSION, "d": distribution_id}
+
+
+def read_distribution_payload(payload: Dict) -> int:
+    return _check_version(payload)["d"]
+
+
+def chunk_payload(distribution_id: int, message_ids: Iterable[int]) -> Dict:
+    return {"v": PROTOCOL_VERSION, "d": distribution_id, "ids": pack_ids(message_ids)}
+
+
+def read_chunk_payload(payload: Dict) -> Tuple[int, List[int]]:
+    payload = _check_version(payload)
+    runs = payload.get("ids")
+    if not isinstance(runs, list) or not all(map(_is_run, runs)):
+        raise ProtocolError(f"Task payload has malformed message id runs: {payload!r}")
+    return payload["d"], unpack_ids(runs)
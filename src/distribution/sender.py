@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, Tuple, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from configs import URL, TOKEN, SEND_CONCURRENCY, SEND_TIMEOUT
+from distribution.throttle import Throttle
+from metrics import MESSAGES_SENT, PROVIDER_LATENCY
+
+
+class LeaseExpired(Exception):
+    pass
+
+
+class MessageSender:
+    def __init__(self, concurrency: int = SEND_CONCURRENCY, url: str = URL, token: str = TOKEN,
+                 timeout: float = SEND_TIMEOUT):
+        self.concurrency = concurrency
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        })
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="sender")
+
+    def send(self, data: Dict) -> requests.Response:
+        with PROVIDER_LATENCY.time():
+            response = self.session.post(url=self.url + str(data["id"]), json=data, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def send_many(self, payloads: Iterable[Dict], concurrency: int | None = None,
+                  throttle: Throttle | None = None,
+                  expired: Callable[[Dict], bool] | None = None) -> Iterator[Tuple[Dict, Exception | None]]:
+        limit = self.concurrency if concurrency is None else max(1, min(concurrency, self.concurrency))
+        in_flight: Dict[Future, Dict] = {}
+        for data in payloads:
+            if len(in_flight) >= limit:
+                yield from self._collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done, throttle)
+            if throttle is not None:
+                throttle.before_send()
+            if expired is not None and expired(data):
+                yield data, LeaseExpired(f"Lease of message {data['id']} expired before sending")
+                continue
+            in_flight[self._executor.submit(self.send, data)] = data
+        while in_flight:
+            yield from self._collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done, throttle)
+
+    @staticmethod
+    def _collect(in_flight: Dict[Future, Dict], done: Set[Future],
+                 throttle: Throttle | None) -> Iterator[Tuple[Dict, Exception | None]]:
+        for future in done:
+            data = in_flight.pop(future)
+            exc = future.exception()
+            MESSAGES_SENT.labels("failed" if exc is not None else "sent").inc()
+            if throttle is not None:
+                throttle.after_send(exc)
+            yield data, exc
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+
+_sender: MessageSender | None = None
+
+
+def get_sender() -> MessageSender:
+    global _sender
+    if _sender is None:
+        _sender = MessageSender()
+    return _sender
@@ -0,0 +1,66 @@
+import logging
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Dict, List
+
+from configs import STATUS_FLUSH_SIZE, STATUS_FLUSH_INTERVAL_MS
+
+logger = logging.getLogger("status_buffer")
+
+
+class StatusBuffer:
+    def __init__(self, data_manager, max_size: int = STATUS_FLUSH_SIZE,
+                 max_delay_ms: int = STATUS_FLUSH_INTERVAL_MS):
+        from db.manager import DataManager
+        self._data_manager: DataManager = data_manager
+        self._max_size = max_size
+        self._max_delay = max_delay_ms / 1000
+        self._sent: List[int] = []
+        self._failed: Dict[int, str] = {}
+        self._flushed_at = monotonic()
+        self._lock = Lock()
+        self._stopped = Event()
+        self._timer: Thread | None = None
+
+    def sent(self, message_id: int):
+        with self._lock:
+            self._sent.append(message_id)
+        self._flush_if_due()
+
+    def failed(self, message_id: int, error: str):
+        with self._lock:
+            self._failed[message_id] = error
+        self._flush_if_due()
+
+    def _flush_if_due(self):
+        if len(self._sent) + len(self._failed) >= self._max_size or monotonic() - self._flushed_at >= self._max_delay:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            sent, self._sent = self._sent, []
+            failed, self._failed = self._failed, {}
+            self._flushed_at = monotonic()
+            if sent:
+                self._data_manager.messages.mark_messages_sent(sent)
+            if failed:
+                self._data_manager.messages.fail_messages(failed)
+
+    def _run_timer(self):
+        while not self._stopped.wait(max(0.0, self._flushed_at + self._max_delay - monotonic())):
+            try:
+                if monotonic() - self._flushed_at >= self._max_delay:
+                    self.flush()
+            except Exception as exc:
+                logger.exception(f"Flushing buffered statuses failed: {exc}")
+
+    def __enter__(self):
+        self._stopped.clear()
+        self._timer = Thread(target=self._run_timer, name="status-buffer", daemon=True)
+        self._timer.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stopped.set()
+        self._timer.join()
+        self.flush()
@@ -1,23 +1,39 @@
-from datetime import datetime
+from typing import Dict
 
-import pytz
-import requests
-from celery import states
+from celery import states, chain, chord
 from celery.exceptions import Ignore
+from celery.concurrency import get_implementation
+from celery.concurrency.prefork import TaskPool
+from celery.signals import worker_init, worker_process_shutdown, worker_ready
 from celery.utils.log import get_task_logger
 
 from celery_conf import celery
-from configs import URL, TOKEN
-from depends import data_manager
+from configs import SEND_CHUNK_SIZE, SEND_MAX_PARALLELISM, WORKER_METRICS_PORT
+from depends import get_data_manager
+from distribution import timezones
+from distribution.protocol import ProtocolError, distribution_payload, read_distribution_payload, chunk_payload, \
+    read_chunk_payload
+from distribution.claims import ChunkClaims, claim_batch_size
+from distribution.sender import LeaseExpired, get_sender
+from distribution.status_buffer import StatusBuffer
+from distribution.throttle import distribution_rate, get_throttle
+from metrics import PendingMessagesCollector, mark_process_dead, multiprocess_dir, reset_multiprocess_dir, \
+    start_server
 
 
 logger = get_task_logger("distribute")
 
+_metrics_server_enabled = True
+
 
 @celery.task(bind=True, retry_backoff=True)
-def distribute(self, distribution_id: int = None):
-    if distribution_id is None:
-        return
+def distribute(self, payload: Dict):
+    data_manager = get_data_manager()
+    try:
+        distribution_id = read_distribution_payload(payload)
+    except ProtocolError as exc:
+        logger.error(str(exc))
+        raise Ignore()
     distribution = data_manager.distributions.get_by_id(distribution_id)
     if distribution is None:
         self.update_state(
@@ -27,35 +43,101 @@ def distribute(self, distribution_id: int = None):
         raise Ignore()
     if distribution.status == "created":
         data_manager.messages.create_distribution_messages(distribution.id)
-    messages_to_send = data_manager.messages.get_distribution_messages(distribution.id)
-    for message in messages_to_send:
-        if message.status != "sent":
-            client = data_manager.clients.get_by_id(message.client_id)
-            # todo sending message base on client timezone
-            # timezone = pytz.timezone(client.time_zone)
-            # if (distribution.start_date.replace(tzinfo=timezone) <= datetime.now(timezone)
-            #         <= distribution.end_date.replace(tzinfo=timezone)):
-            header = {
-                "Authorization": f"Bearer {TOKEN}",
-                "Content-Type": "application/json",
-            }
-            data = {
-                "id": message.id,
-                "phone": client.phone_number,
-                "text": distribution.text,
-            }
-            try:
-                requests.post(url=URL + str(data["id"]), headers=header, json=data)
-            except requests.exceptions.RequestException as exc:
-                logger.warning(f"Sending message {message.id} failed: {exc}")
+    data_manager.messages.fail_expired_leases(distribution.id)
+    time_zones = timezones.open_time_zones(
+        data_manager.messages.get_pending_time_zones(distribution.id),
+        distribution.start_date, distribution.end_date, timezones.utc_now())
+    message_ids = data_manager.messages.get_pending_message_ids(distribution.id, time_zones) if time_zones else []
+    if not message_ids:
+        data_manager.manage_status(distribution.id)
+        return
+    chunk_size = distribution.chunk_size or SEND_CHUNK_SIZE
+    parallelism = distribution.max_parallelism or SEND_MAX_PARALLELISM
+    chunks = [message_ids[i:i + chunk_size] for i in range(0, len(message_ids), chunk_size)]
+    lanes = [
+        chain(send_chunk.si(chunk_payload(distribution.id, chunk)) for chunk in chunks[lane::parallelism])
+        for lane in range(min(parallelism, len(chunks)))
+    ]
+    data_manager.distributions.mark_distribution_started(distribution.id)
+    chord(lanes)(manage_status.si(distribution_payload(distribution.id)))
+    logger.info(f"Distribution {distribution.id}: {len(message_ids)} messages in {len(chunks)} chunks, "
+                f"{len(lanes)} parallel lanes")
+
+
+@celery.task
+def send_chunk(payload: Dict):
+    data_manager = get_data_manager()
+    try:
+        distribution_id, message_ids = read_chunk_payload(payload)
+    except ProtocolError as exc:
+        logger.error(str(exc))
+        raise Ignore()
+    distribution = data_manager.distributions.get_by_id(distribution_id)
+    if distribution is None:
+        return
+    sender = get_sender()
+    claims = ChunkClaims(data_manager, distribution_id, message_ids,
+                         claim_batch_size(distribution.max_concurrency or sender.concurrency,
+                                          distribution_rate(distribution)))
+    payloads = (
+        {
+            "id": message.id,
+            "phone": message.phone_number,
+            "text": distribution.text,
+        }
+        for message in claims
+    )
+    with StatusBuffer(data_manager) as statuses:
+        def heartbeat():
+            statuses.flush()
+            claims.renew()
+
+        throttle = get_throttle(distribution, heartbeat)
+        for data, exc in sender.send_many(payloads, distribution.max_concurrency, throttle,
+                                          lambda data: claims.expired(data["id"])):
+            if isinstance(exc, LeaseExpired):
+                logger.warning(str(exc))
+            elif exc is not None:
+                logger.warning(f"Sending message {data['id']} failed: {exc}")
+                statuses.failed(data["id"], str(exc))
             else:
-                logger.info(
-                    f"Message sent id={message.id}, phone={client.phone_number}, text={distribution.text}")
-                data_manager.messages.mark_message_sent(message.id)
-    status = data_manager.manage_status(distribution.id)
-    # if status != "finished":
-    #     self.update_state(
-    #         state=states.FAILURE,
-    #         meta=f"Distribution with id {distribution_id} not finished, status={status}"
-    #     )
-    #     raise Ignore()
+                logger.info(f"Message sent id={data['id']}, phone={data['phone']}, text={data['text']}")
+                statuses.sent(data["id"])
+
+
+@celery.task
+def manage_status(payload: Dict):
+    data_manager = get_data_manager()
+    try:
+        distribution_id = read_distribution_payload(payload)
+    except ProtocolError as exc:
+        logger.error(str(exc))
+        raise Ignore()
+    return data_manager.manage_status(distribution_id)
+
+
+@worker_init.connect
+def prepare_metrics(sender, **_):
+    global _metrics_server_enabled
+    if multiprocess_dir() is not None:
+        reset_multiprocess_dir()
+    elif issubclass(get_implementation(sender.pool_cls), TaskPool):
+        _metrics_server_enabled = False
+        logger.warning("Send metrics are recorded in the prefork pool processes, metrics server is not started: "
+                       "set PROMETHEUS_MULTIPROC_DIR to a directory before starting the worker")
+
+
+@worker_ready.connect
+def start_metrics_server(**_):
+    if not _metrics_server_enabled:
+        return
+    pending = PendingMessagesCollector(get_data_manager().messages.count_pending_by_distribution)
+    try:
+        start_server(WORKER_METRICS_PORT, pending)
+    except OSError as exc:
+        logger.warning(f"Metrics server is not started on port {WORKER_METRICS_PORT}: {exc}")
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid, **_):
+    mark_process_dead(pid)
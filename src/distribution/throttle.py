@@ -0,0 +1,130 @@
+from time import monotonic, sleep, time
+from typing import Callable, List
+
+from redis import Redis
+from requests import Response
+
+from configs import RATE_LIMIT, BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN, BREAKER_MAX_OPEN, MESSAGE_LEASE_SECONDS
+from redis_conf import get_redis
+
+HEARTBEAT_INTERVAL = 1.0
+
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "timestamp")
+local tokens = tonumber(bucket[1]) or capacity
+local timestamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - timestamp) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "timestamp", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    def __init__(self, redis: Redis, key: str, rate: float, capacity: float | None = None):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def acquire(self, heartbeat: Callable[[], None] | None = None, heartbeat_interval: float = HEARTBEAT_INTERVAL):
+        while True:
+            wait = float(self._script(keys=[self.key], args=[self.rate, self.capacity, time(), 1]))
+            if wait <= 0:
+                return
+            _sleep(wait, heartbeat, heartbeat_interval)
+
+
+class CircuitBreaker:
+    def __init__(self, redis: Redis, key: str = "throttle:breaker", threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN,
+                 max_open: float = min(BREAKER_MAX_OPEN, MESSAGE_LEASE_SECONDS / 2)):
+        self._redis = redis
+        self._open_key = f"{key}:open"
+        self._failures_key = f"{key}:failures"
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_open = max_open
+        self._failing = False
+
+    def wait(self, heartbeat: Callable[[], None] | None = None, heartbeat_interval: float = HEARTBEAT_INTERVAL):
+        while (remaining := self._redis.pttl(self._open_key)) > 0:
+            _sleep(remaining / 1000, heartbeat, heartbeat_interval)
+
+    def open(self, seconds: float):
+        self._redis.set(self._open_key, 1, px=max(1, int(min(seconds, self.max_open) * 1000)))
+        self._redis.delete(self._failures_key)
+
+    def record(self, exc: Exception | None):
+        if exc is None:
+            if self._failing:
+                self._redis.delete(self._failures_key)
+                self._failing = False
+            return
+        self._failing = True
+        response: Response | None = getattr(exc, "response", None)
+        if response is not None and response.status_code == 429:
+            self.open(_retry_after(response) or self.cooldown)
+            return
+        failures = self._redis.incr(self._failures_key)
+        self._redis.expire(self._failures_key, int(self.cooldown) + 1)
+        if failures >= self.threshold:
+            self.open(self.cooldown)
+
+
+def _retry_after(response: Response) -> float | None:
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+def _sleep(seconds: float, heartbeat: Callable[[], None] | None, heartbeat_interval: float):
+    if heartbeat is None:
+        sleep(seconds)
+        return
+    deadline = monotonic() + seconds
+    while (remaining := deadline - monotonic()) > 0:
+        heartbeat()
+        sleep(min(remaining, heartbeat_interval))
+
+
+class Throttle:
+    def __init__(self, breaker: CircuitBreaker, limiters: List[TokenBucket],
+                 heartbeat: Callable[[], None] | None = None, heartbeat_interval: float = HEARTBEAT_INTERVAL):
+        self.breaker = breaker
+        self.limiters = limiters
+        self.heartbeat = heartbeat
+        self.heartbeat_interval = heartbeat_interval
+
+    def before_send(self):
+        self.breaker.wait(self.heartbeat, self.heartbeat_interval)
+        for limiter in self.limiters:
+            limiter.acquire(self.heartbeat, self.heartbeat_interval)
+
+    def after_send(self, exc: Exception | None):
+        self.breaker.record(exc)
+
+
+def distribution_rate(distribution) -> float | None:
+    return min((rate for rate in [RATE_LIMIT, distribution.rate_limit] if rate and rate > 0), default=None)
+
+
+def get_throttle(distribution, heartbeat: Callable[[], None] | None = None) -> Throttle:
+    redis = get_redis()
+    limiters = []
+    if RATE_LIMIT > 0:
+        limiters.append(TokenBucket(redis, "throttle:global", RATE_LIMIT))
+    if distribution.rate_limit:
+        limiters.append(TokenBucket(redis, f"throttle:distribution:{distribution.id}", distribution.rate_limit))
+    return Throttle(CircuitBreaker(redis), limiters, heartbeat)
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+import pytz
+from pytz.tzinfo import BaseTzInfo
+
+MAX_UTC_OFFSET = timedelta(hours=14)
+MIN_UTC_OFFSET = timedelta(hours=-12)
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str) -> BaseTzInfo:
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=4096)
+def local_window(name: str, start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    timezone = get_timezone(name)
+    return timezone.localize(start).astimezone(pytz.utc), timezone.localize(end).astimezone(pytz.utc)
+
+
+def group_by_offset(time_zones: Iterable[str], start: datetime,
+                    end: datetime) -> Dict[Tuple[datetime, datetime], List[str]]:
+    groups = {}
+    for name in time_zones:
+        groups.setdefault(local_window(name, start, end), []).append(name)
+    return groups
+
+
+def open_time_zones(time_zones: Iterable[str], start: datetime, end: datetime, now: datetime) -> List[str]:
+    return [
+        name
+        for (opens, closes), names in group_by_offset(time_zones, start, end).items()
+        if opens <= now < closes
+        for name in names
+    ]
+
+
+def next_window_open(time_zones: Iterable[str], start: datetime, end: datetime, now: datetime) -> datetime | None:
+    upcoming = [opens for opens, closes in group_by_offset(time_zones, start, end) if opens > now]
+    return min(upcoming, default=None)
+
+
+def earliest_open(start: datetime) -> datetime:
+    return to_local((start - MAX_UTC_OFFSET).replace(tzinfo=pytz.utc))
+
+
+def latest_close(end: datetime) -> datetime:
+    return to_local((end - MIN_UTC_OFFSET).replace(tzinfo=pytz.utc))
+
+
+def to_local(moment: datetime) -> datetime:
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def utc_now() -> datetime:
+    return datetime.now(pytz.utc)
@@ -1,37 +1,145 @@
+import heapq
 import logging
-from datetime import datetime
-from threading import Thread
+from datetime import datetime, timedelta
+from threading import Thread, Condition
 from time import sleep
+from typing import Dict, List, Set, Tuple
 
+from celery.result import AsyncResult
+
+from configs import SCHEDULER_CHECK_INTERVAL
+from distribution import timezones
+from distribution.protocol import distribution_payload
 from distribution.task import distribute
+from metrics import SCHEDULER_CYCLE
 
 logger = logging.getLogger("distribution_worker")
 
 
 class DistributionsWorker(Thread):
-    def __init__(self, data_manager):
+    def __init__(self, data_manager, check_interval: float = SCHEDULER_CHECK_INTERVAL):
         from db.manager import DataManager
         self._data_manager: DataManager = data_manager
-        self._first_run = True
+        self._check_interval = timedelta(seconds=check_interval)
+        self._heap: List[Tuple[datetime, int]] = []
+        self._deadlines: Dict[int, datetime] = {}
+        self._active: Dict[int, AsyncResult] = {}
+        self._changed: Set[int] = set()
+        self._condition = Condition()
+        self._data_manager.subscribe(self.notify)
         super().__init__()
         self.daemon = True
 
+    def notify(self, dist_id: int):
+        with self._condition:
+            self._changed.add(dist_id)
+            self._condition.notify()
+
+    def resync(self):
+        try:
+            dist_ids = self._distribution_ids()
+        except Exception as exc:
+            logger.exception(f"Distributions resync failed: {exc}")
+            return
+        with self._condition:
+            self._changed.update(dist_ids)
+            self._condition.notify()
+
     def run(self):
         while True:
-            distributions = self._data_manager.distributions.get_all()
-            required_statuses = ["created", "unfinished"]
-            if self._first_run:
-                required_statuses.append("started")
-            for distribution in distributions:
-                if distribution["status"] in required_statuses:
-                    now = datetime.now()
-                    if distribution["start_date"] < now:
-                        if distribution["end_date"] > now:
-                            distribute.apply_async((distribution["id"],), expires=distribution["end_date"])
-                            logger.info(f"Distribution {distribution['id']} worker started")
-                        else:
-                            self._data_manager.distributions.mark_distribution_expired(distribution["id"])
-                            logger.info(f"Distribution {distribution['id']} expired")
-
-            self._first_run = False
-            sleep(15)
+            try:
+                dist_ids = self._distribution_ids()
+                break
+            except Exception as exc:
+                logger.exception(f"Loading distributions failed: {exc}")
+                sleep(self._check_interval.total_seconds())
+        now = datetime.now()
+        for dist_id in dist_ids:
+            self._push(dist_id, now)
+        while True:
+            with self._condition:
+                while not self._changed and not self._is_due():
+                    self._condition.wait(self._timeout())
+                changed, self._changed = self._changed, set()
+            with SCHEDULER_CYCLE.time():
+                now = datetime.now()
+                for dist_id in changed:
+                    self._push(dist_id, now)
+                while self._is_due():
+                    deadline, dist_id = heapq.heappop(self._heap)
+                    if self._deadlines.get(dist_id) != deadline:
+                        continue
+                    del self._deadlines[dist_id]
+                    try:
+                        self._process(dist_id)
+                    except Exception as exc:
+                        logger.exception(f"Distribution {dist_id} check failed: {exc}")
+                        self._push(dist_id, datetime.now() + self._check_interval)
+
+    def _distribution_ids(self) -> List[int]:
+        return [distribution["id"] for distribution in self._data_manager.distributions.get_all()]
+
+    def _push(self, dist_id: int, deadline: datetime):
+        self._deadlines[dist_id] = deadline
+        heapq.heappush(self._heap, (deadline, dist_id))
+
+    def _is_due(self) -> bool:
+        return bool(self._heap) and self._heap[0][0] <= datetime.now()
+
+    def _timeout(self) -> float | None:
+        if not self._heap:
+            return None
+        return max((self._heap[0][0] - datetime.now()).total_seconds(), 0)
+
+    def _is_active(self, dist_id: int) -> bool:
+        result = self._active.get(dist_id)
+        if result is not None and result.ready():
+            del self._active[dist_id]
+            result = None
+        return result is not None
+
+    def _start(self, dist_id: int, end_date: datetime):
+        self._active[dist_id] = distribute.apply_async((distribution_payload(dist_id),),
+                                                       expires=timezones.latest_close(end_date))
+        logger.info(f"Distribution {dist_id} worker started")
+
+    def _process(self, dist_id: int):
+        distribution = self._data_manager.distributions.get_by_id(dist_id)
+        if distribution is None or distribution.status in ["finished", "expired"]:
+            self._active.pop(dist_id, None)
+            return
+        now = datetime.now()
+        opens = timezones.earliest_open(distribution.start_date)
+        if opens > now:
+            self._push(dist_id, opens)
+            return
+        leased = distribution.lease_expires_at is not None and distribution.lease_expires_at > now
+        if self._is_active(dist_id) or (distribution.status == "started" and leased):
+            self._push(dist_id, now + self._check_interval)
+            return
+        next_run = self._next_run(distribution, now)
+        if next_run is None:
+            self._data_manager.distributions.mark_distribution_expired(dist_id)
+            logger.info(f"Distribution {dist_id} expired")
+        elif next_run > now:
+            self._push(dist_id, next_run)
+        else:
+            self._start(dist_id, distribution.end_date)
+            self._push(dist_id, now + self._check_interval)
+
+    def _next_run(self, distribution, now: datetime) -> datetime | None:
+        utc_now = timezones.utc_now()
+        if distribution.status == "created":
+            time_zones = self._data_manager.clients.get_audience_time_zones(
+                distribution.filter_tag, distribution.filter_mobile_operator)
+            if not time_zones:
+                if timezones.latest_close(distribution.end_date) <= now:
+                    return None
+                return max(now, distribution.start_date)
+        else:
+            time_zones = self._data_manager.messages.get_pending_time_zones(distribution.id)
+        if timezones.open_time_zones(time_zones, distribution.start_date, distribution.end_date, utc_now):
+            next_attempt = self._data_manager.messages.get_next_attempt_at(distribution.id)
+            return now if next_attempt is None else max(now, next_attempt)
+        next_open = timezones.next_window_open(time_zones, distribution.start_date, distribution.end_date, utc_now)
+        return None if next_open is None else timezones.to_local(next_open)
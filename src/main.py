@@ -1,5 +1,37 @@
+import argparse
+import logging
+import os
+
 import uvicorn
 
 
-if __name__ == '__main__':
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
+def main():
+    parser = argparse.ArgumentParser(description="Run the distribution manager API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="API processes, WEB_CONCURRENCY by default")
+    parser.add_argument("--reload", action="store_true", help="single process with autoreload for development")
+    args = parser.parse_args()
+
+    if args.reload:
+        uvicorn.run("app:app", host=args.host, port=args.port, reload=True)
+        return
+
+    os.environ["EMBEDDED_SCHEDULER"] = "false"
+    from configs import WEB_CONCURRENCY
+    from db.engine import get_engine
+    from db.migrations import check_schema
+    from depends import get_data_manager
+    from distribution.events import listen_changes
+    from distribution.worker import DistributionsWorker
+
+    logging.basicConfig(level=logging.INFO)
+    check_schema(get_engine())
+    scheduler = DistributionsWorker(get_data_manager())
+    scheduler.start()
+    listen_changes(scheduler.notify, scheduler.resync)
+    uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers or WEB_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from configs import ARCHIVE_AFTER_DAYS
+from db.migrations import migrate, get_version, check_schema, rebuild_counters, LATEST_VERSION
+from db.engine import get_engine
+from db.manager import DataManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribution manager maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="upgrade the database schema")
+    migrate_parser.add_argument("--target", type=int, default=LATEST_VERSION)
+    commands.add_parser("version", help="print the current schema version")
+    reconcile_parser = commands.add_parser("reconcile", help="rebuild per-distribution message counters")
+    reconcile_parser.add_argument("--distribution", type=int, default=None)
+    archive_parser = commands.add_parser("archive", help="move messages of old finished/expired distributions")
+    archive_parser.add_argument("--older-than-days", type=float, default=ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine()
+    if args.command in ["reconcile", "archive"]:
+        check_schema(engine)
+    if args.command == "migrate":
+        applied = migrate(engine, args.target)
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    elif args.command == "version":
+        with engine.connect() as connection:
+            print(f"Schema version {get_version(connection)} (latest {LATEST_VERSION})")
+    elif args.command == "reconcile":
+        with engine.begin() as connection:
+            rebuilt = rebuild_counters(connection, args.distribution)
+        print(f"Rebuilt counters for distributions: {rebuilt}" if rebuilt else "Counters are consistent")
+    elif args.command == "archive":
+        archived = DataManager(engine).messages.archive(datetime.now() - timedelta(days=args.older_than_days))
+        print(f"Archived distributions: {archived}" if archived else "Nothing to archive")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import glob
+import inspect
+import os
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess, \
+    start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+MESSAGES_SENT = Counter(
+    "distribution_messages_sent_total", "Messages handed to the provider, by outcome", ["result"])
+PROVIDER_LATENCY = Histogram(
+    "distribution_provider_latency_seconds", "Provider send request latency",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+DB_QUERY_DURATION = Histogram(
+    "distribution_db_query_duration_seconds", "Duration of DataManager methods", ["method"])
+SCHEDULER_CYCLE = Histogram(
+    "distribution_scheduler_cycle_seconds", "Time the scheduler spends handling one wake-up")
+CACHE_REQUESTS = Counter(
+    "distribution_read_cache_requests_total", "Read cache lookups by tier outcome", ["cache", "result"])
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency per route", ["method", "route", "status"])
+
+
+def _timed(name: str, method):
+    if inspect.iscoroutinefunction(method):
+        @wraps(method)
+        async def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                DB_QUERY_DURATION.labels(name).observe(perf_counter() - started)
+    else:
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                DB_QUERY_DURATION.labels(name).observe(perf_counter() - started)
+    return wrapper
+
+
+def instrument(cls):
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(attr) or inspect.isasyncgenfunction(attr):
+            continue
+        setattr(cls, name, _timed(f"{cls.__name__}.{name}", attr))
+    return cls
+
+
+class PendingMessagesCollector(Collector):
+    def __init__(self, pending: Callable[[], Dict[int, int]]):
+        self._pending = pending
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "distribution_pending_messages", "Messages still waiting to be sent, per active distribution",
+            labels=["distribution_id"])
+        for distribution_id, count in self._pending().items():
+            gauge.add_metric([str(distribution_id)], count)
+        yield gauge
+
+
+def multiprocess_dir() -> str | None:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def mark_process_dead(pid: int):
+    if multiprocess_dir() is not None:
+        multiprocess.mark_process_dead(pid)
+
+
+def reset_multiprocess_dir():
+    directory = multiprocess_dir()
+    pids = {os.path.basename(path)[:-len(".db")].rsplit("_", 1)[-1]
+            for path in glob.glob(os.path.join(directory, "*_*.db"))}
+    for pid in sorted(int(pid) for pid in pids if pid.isdigit()):
+        if _process_alive(pid):
+            continue
+        multiprocess.mark_process_dead(pid, directory)
+        for path in glob.glob(os.path.join(directory, f"*_{pid}.db")):
+            os.remove(path)
+
+
+def registry(*collectors: Collector) -> CollectorRegistry:
+    if multiprocess_dir() is None:
+        collector_registry = REGISTRY
+    else:
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+    for collector in collectors:
+        collector_registry.register(collector)
+    return collector_registry
+
+
+def latest() -> bytes:
+    return generate_latest(registry())
+
+
+def start_server(port: int, *collectors: Collector):
+    start_http_server(port, registry=registry(*collectors))
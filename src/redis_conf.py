@@ -0,0 +1,38 @@
+import logging
+from threading import Thread
+from time import sleep
+from typing import Callable
+
+from redis import Redis, RedisError
+
+from configs import REDIS_HOST, REDIS_PORT
+
+logger = logging.getLogger("redis_conf")
+
+_redis: Redis | None = None
+
+
+def get_redis() -> Redis:
+    global _redis
+    if _redis is None:
+        _redis = Redis(host=REDIS_HOST, port=int(REDIS_PORT))
+    return _redis
+
+
+def listen(channel: str, on_message: Callable[[bytes], None], on_subscribe: Callable[[], None],
+           redis: Callable[[], Redis] = get_redis) -> Thread:
+    def run():
+        while True:
+            try:
+                pubsub = redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                on_subscribe()
+                for message in pubsub.listen():
+                    on_message(message["data"])
+            except RedisError as exc:
+                logger.warning(f"Subscription to {channel} lost: {exc}")
+                sleep(1)
+
+    thread = Thread(target=run, name=f"listen-{channel}", daemon=True)
+    thread.start()
+    return thread
@@ -1,44 +1,58 @@
-from fastapi import APIRouter, HTTPException
+from typing import List
 
-from depends import data_manager
-from services.validation import NewClient, UpdateClient
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from configs import PAGE_SIZE
+from depends import get_async_data_manager
+from services.importer import ImportFormat, import_clients
+from services.serialization import ndjson
+from services.validation import NewClient, UpdateClient, ClientOut
 
 router = APIRouter(prefix="/client", tags=["client"])
 
 
-@router.get('/get/{client_id}', responses={404: {"message": "Not found"}})
-def get_client(client_id: int):
-    client = data_manager.clients.get_by_id(client_id)
+@router.get('/get/{client_id}', response_model=ClientOut, responses={404: {"message": "Not found"}})
+async def get_client(client_id: int):
+    client = await get_async_data_manager().clients.get_cached(client_id)
     if client is not None:
         return client
     raise HTTPException(status_code=404, detail="Not found")
 
 
-@router.get('/get_all')
-def get_clients():
-    clients = data_manager.clients.get_all()
-    if clients is not None:
-        return clients
-    return []
+@router.get('/get_all', response_model=List[ClientOut])
+async def get_clients(after_id: int | None = None, limit: int = Query(default=PAGE_SIZE, ge=1, le=1000),
+                      stream: bool = False):
+    if stream:
+        return StreamingResponse(ndjson(get_async_data_manager().clients.stream_all()),
+                                 media_type="application/x-ndjson")
+    return await get_async_data_manager().clients.get_page(after_id, limit)
 
 
 @router.post('/add')
-def add_client(client: NewClient):
-    data_manager.clients.add(client)
+async def add_client(client: NewClient):
+    await get_async_data_manager().clients.add(client)
     return "OK"
 
 
+@router.post('/import')
+async def import_clients_file(request: Request, file_format: ImportFormat | None = None):
+    if file_format is None:
+        file_format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    return await import_clients(request.stream(), file_format, get_async_data_manager().clients.add_many)
+
+
 @router.put('/update/{client_id}', responses={404: {"message": "Not found"}})
-def update_client(client_id: int, updated_fields: UpdateClient):
-    result = data_manager.clients.update(client_id, updated_fields)
+async def update_client(client_id: int, updated_fields: UpdateClient):
+    result = await get_async_data_manager().clients.update(client_id, updated_fields)
     if result is False:
         raise HTTPException(status_code=404, detail="Not found")
     return "OK"
 
 
 @router.delete('/delete/{client_id}', responses={404: {"message": "Not found"}})
-def delete_client(client_id):
-    result = data_manager.clients.delete(client_id)
+async def delete_client(client_id):
+    result = await get_async_data_manager().clients.delete(client_id)
     if result is False:
         raise HTTPException(status_code=404, detail="Not found")
     return "OK"
@@ -1,48 +1,58 @@
 from typing import List, Dict
 
-from fastapi import APIRouter, HTTPException
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
-from depends import data_manager
-from services.validation import NewDistribution, UpdateDistribution
+from configs import PAGE_SIZE
+from depends import get_async_data_manager
+from services.serialization import ndjson
+from services.validation import NewDistribution, UpdateDistribution, DistributionOut, Audience
 
 router = APIRouter(prefix="/distribution", tags=["distribution"])
 
 
-@router.get('/get/{dist_id}', responses={404: {"message": "Not found"}})
-def get_distribution(dist_id: int):
-    distribution = data_manager.distributions.get_by_id(dist_id)
+@router.get('/get/{dist_id}', response_model=DistributionOut, responses={404: {"message": "Not found"}})
+async def get_distribution(dist_id: int):
+    distribution = await get_async_data_manager().distributions.get_cached(dist_id)
     if distribution is not None:
         return distribution
     raise HTTPException(status_code=404, detail="Not found")
 
 
-@router.get('/get_all', response_model=List)
-def get_distributions():
-    distributions = data_manager.distributions.get_all()
-    if distributions is not None:
-        return jsonable_encoder(distributions)
-    return []
+@router.get('/get_all', response_model=List[DistributionOut])
+async def get_distributions(after_id: int | None = None, limit: int = Query(default=PAGE_SIZE, ge=1, le=1000),
+                            stream: bool = False):
+    if stream:
+        return StreamingResponse(ndjson(get_async_data_manager().distributions.stream_all()),
+                                 media_type="application/x-ndjson")
+    return await get_async_data_manager().distributions.get_page(after_id, limit)
+
+
+@router.get('/audience', response_model=Audience)
+async def get_audience(filter_tag: str = "all", filter_mobile_operator: str = "000"):
+    count = await get_async_data_manager().clients.count_audience(filter_tag, filter_mobile_operator)
+    return {"filter_tag": filter_tag, "filter_mobile_operator": filter_mobile_operator, "count": count}
 
 
 @router.post('/add')
-def add_distribution(distribution: NewDistribution):
-    data_manager.distributions.add(distribution)
+async def add_distribution(distribution: NewDistribution):
+    await get_async_data_manager().distributions.add(distribution)
     return "OK"
 
 
 @router.put('/update/{dist_id}', responses={404: {"message": "Not found"}})
-def update_distribution(dist_id: int, updated_fields: UpdateDistribution):
-    result = data_manager.distributions.update(dist_id, updated_fields)
+async def update_distribution(dist_id: int, updated_fields: UpdateDistribution):
+    result = await get_async_data_manager().distributions.update(dist_id, updated_fields)
     if result is False:
         raise HTTPException(status_code=403,
-                            detail="Distribution not found or distribution already started or finished")
+                            detail="Distribution not found, already started or finished, "
+                                   "or its audience filters changed after messages were created")
     return "OK"
 
 
 @router.delete('/delete/{dist_id}', responses={404: {"message": "Not found"}})
-def delete_distribution(dist_id):
-    result = data_manager.distributions.delete(dist_id)
+async def delete_distribution(dist_id):
+    result = await get_async_data_manager().distributions.delete(dist_id)
     if result is False:
         raise HTTPException(status_code=403, detail="Distribution not found")
     return "OK"
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from metrics import latest
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get('/metrics')
+async def get_metrics():
+    return Response(content=latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,15 +1,27 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
 
-from depends import data_manager
+from depends import get_async_data_manager
+from services.validation import Stat, DetailedDistributionStat
 
 router = APIRouter(prefix="/stat", tags=["stat"])
 
 
-@router.get('/get_stat')
-def get_stat():
-    return data_manager.get_stat()
+@router.get('/get_stat', response_model=Stat)
+async def get_stat():
+    return await get_async_data_manager().get_stat()
 
 
-@router.get('/get_distribution_stat/{dist_id}')
-def get_distribution_stat(dist_id: int):
-    return data_manager.distributions.get_stat(dist_id, detailed=True)
+@router.get('/cache')
+async def get_cache_stat():
+    return get_async_data_manager().data_manager.get_cache_stat()
+
+
+@router.get('/get_distribution_stat/{dist_id}', response_model=DetailedDistributionStat,
+            responses={404: {"message": "Not found"}})
+async def get_distribution_stat(dist_id: int, status: str | None = None, cursor: int | None = None,
+                                limit: int = Query(default=100, ge=1, le=1000)):
+    stat = await get_async_data_manager().distributions.get_stat(dist_id, detailed=True, status=status, cursor=cursor,
+                                                           limit=limit)
+    if stat is False:
+        raise HTTPException(status_code=404, detail="Not found")
+    return stat
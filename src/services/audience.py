@@ -0,0 +1,50 @@
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, Tuple
+
+from configs import AUDIENCE_CACHE_SIZE, AUDIENCE_CACHE_TTL
+from db.cache import ALL_KEYS, InvalidationBus
+
+AudienceKey = Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+class AudienceCache:
+    def __init__(self, max_size: int = AUDIENCE_CACHE_SIZE, ttl: float = AUDIENCE_CACHE_TTL,
+                 bus: InvalidationBus | None = None):
+        self.name = "audience"
+        self.max_size = max_size
+        self.ttl = ttl
+        self._bus = bus
+        self._counts: Dict[AudienceKey, Tuple[float, int]] = {}
+        self._lock = Lock()
+        if bus is not None:
+            bus.register(self)
+
+    def get(self, key: AudienceKey) -> int | None:
+        if self._bus is not None:
+            self._bus.listen()
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is None or entry[0] <= monotonic():
+                return None
+            return entry[1]
+
+    def set(self, key: AudienceKey, count: int):
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= self.max_size:
+                del self._counts[next(iter(self._counts))]
+            self._counts[key] = monotonic() + self.ttl, count
+
+    def invalidate(self, segments: Iterable[Tuple[str | None, str | None]]):
+        segments = set(segments)
+        with self._lock:
+            for tags, operators in list(self._counts):
+                if any((not tags or tag in tags) and (not operators or operator in operators)
+                       for tag, operator in segments):
+                    del self._counts[(tags, operators)]
+        if self._bus is not None:
+            self._bus.publish(self.name, ALL_KEYS)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
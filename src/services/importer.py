@@ -0,0 +1,73 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Literal
+
+from pydantic import ValidationError
+
+from configs import IMPORT_BATCH_SIZE, IMPORT_MAX_ERRORS
+from services.validation import NewClient
+
+ImportFormat = Literal["csv", "ndjson"]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    started = False
+    async for chunk in chunks:
+        buffer += chunk
+        if not started:
+            if len(buffer) < len(codecs.BOM_UTF8) and codecs.BOM_UTF8.startswith(buffer):
+                continue
+            buffer = buffer.removeprefix(codecs.BOM_UTF8)
+            started = True
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer:
+        yield buffer.removeprefix(codecs.BOM_UTF8).rstrip(b"\r")
+
+
+def _csv_record(header: List[str], line: str) -> Dict:
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        raise ValueError(f"expected {len(header)} columns, got {len(values)}")
+    return {field: value for field, value in zip(header, values) if value != ""}
+
+
+def _error_message(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+    return str(exc)
+
+
+async def import_clients(chunks: AsyncIterator[bytes], file_format: ImportFormat,
+                         save_batch: Callable[[List[Dict]], Awaitable[None]],
+                         batch_size: int = IMPORT_BATCH_SIZE, max_errors: int = IMPORT_MAX_ERRORS) -> Dict:
+    result = {"imported": 0, "failed": 0, "errors": []}
+    header = None
+    batch = []
+    row = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        if file_format == "csv" and header is None:
+            header = [field.strip() for field in next(csv.reader([line.decode("utf-8", errors="replace")]))]
+            continue
+        row += 1
+        try:
+            text = line.decode("utf-8")
+            record = _csv_record(header, text) if file_format == "csv" else json.loads(text)
+            batch.append(NewClient.model_validate(record).model_dump())
+        except (ValueError, ValidationError) as exc:
+            result["failed"] += 1
+            if len(result["errors"]) < max_errors:
+                result["errors"].append({"row": row, "error": _error_message(exc)})
+        if len(batch) >= batch_size:
+            await save_batch(batch)
+            result["imported"] += len(batch)
+            batch = []
+    if batch:
+        await save_batch(batch)
+        result["imported"] += len(batch)
+    return result
@@ -0,0 +1,8 @@
+from typing import AsyncIterator, Dict, List
+
+import orjson
+
+
+async def ndjson(batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
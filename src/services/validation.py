@@ -1,8 +1,8 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 import pytz
-from pydantic import BaseModel, field_validator, Field
+from pydantic import BaseModel, ConfigDict, field_validator, Field
 
 
 class NewClient(BaseModel):
@@ -19,7 +19,7 @@ class NewClient(BaseModel):
 
     @field_validator("time_zone")
     def validate_time_zone(cls, value):
-        if value in pytz.all_timezones:
+        if value in pytz.all_timezones_set:
             return value
         raise ValueError("Time zone validation failed")
 
@@ -44,7 +44,7 @@ class UpdateClient(BaseModel):
 
     @field_validator("time_zone")
     def validate_time_zone(cls, value):
-        if value in pytz.all_timezones:
+        if value in pytz.all_timezones_set:
             return value
         raise ValueError("Time zone validation failed")
 
@@ -56,10 +56,14 @@ class NewDistribution(BaseModel):
     text: str
     filter_mobile_operator: str = "000"
     filter_tag: str = "all"
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+    chunk_size: Optional[int] = Field(default=None, ge=1)
+    max_parallelism: Optional[int] = Field(default=None, ge=1)
+    rate_limit: Optional[float] = Field(default=None, gt=0)
 
     @field_validator("filter_mobile_operator")
     def validate_mobile_operator(cls, value):
-        if len(value) == 3 and value.isalnum() or value is None:
+        if value is None or all(len(code.strip()) == 3 and code.strip().isalnum() for code in value.split(",")):
             return value
         raise ValueError("Mobile operator validation failed")
 
@@ -71,9 +75,83 @@ class UpdateDistribution(BaseModel):
     text: Optional[str] = None
     filter_mobile_operator: Optional[str] = None
     filter_tag: Optional[str] = None
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+    chunk_size: Optional[int] = Field(default=None, ge=1)
+    max_parallelism: Optional[int] = Field(default=None, ge=1)
+    rate_limit: Optional[float] = Field(default=None, gt=0)
 
     @field_validator("filter_mobile_operator")
     def validate_mobile_operator(cls, value):
-        if len(value) == 3 and value.isalnum() or value is None:
+        if value is None or all(len(code.strip()) == 3 and code.strip().isalnum() for code in value.split(",")):
             return value
         raise ValueError("Mobile operator validation failed")
+
+
+class ClientOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    phone_number: int
+    mobile_operator: str
+    tag: Optional[str] = None
+    time_zone: str
+
+
+class DistributionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    start_date: datetime
+    end_date: datetime
+    text: str
+    filter_mobile_operator: Optional[str] = None
+    filter_tag: Optional[str] = None
+    status: str
+    max_concurrency: Optional[int] = None
+    chunk_size: Optional[int] = None
+    max_parallelism: Optional[int] = None
+    lease_expires_at: Optional[datetime] = None
+    rate_limit: Optional[float] = None
+    archived_at: Optional[datetime] = None
+
+
+class MessageOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    distribution_id: int
+    client_id: int
+    status: str
+    sending_time: Optional[datetime] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+    client: Optional[ClientOut] = None
+
+
+class MessagesCnt(BaseModel):
+    total: int
+    created: int
+    sent: int
+    failed: int
+
+
+class DistributionStat(BaseModel):
+    distribution: DistributionOut
+    messages_cnt: MessagesCnt
+
+
+class DetailedDistributionStat(DistributionStat):
+    messages: Dict[str, List[MessageOut]]
+    next_cursor: Optional[int] = None
+
+
+class Stat(BaseModel):
+    total_dist_cnt: int
+    distributions: List[DistributionStat]
+
+
+class Audience(BaseModel):
+    filter_tag: str
+    filter_mobile_operator: str
+    count: int
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from typing import Callable
+
+import pytest
+from sqlalchemy import Engine, insert
+
+from db.engine import create_db_engine
+from db.manager import DataManager
+from db.migrations import migrate, rebuild_counters
+from db.models import Client
+from services.validation import NewDistribution
+
+
+@pytest.fixture
+def engine(tmp_path) -> Engine:
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def data_manager(engine: Engine) -> DataManager:
+    return DataManager(engine, redis=None)
+
+
+@pytest.fixture
+def campaign(data_manager: DataManager) -> Callable[..., int]:
+    def create(clients: int, tag: str = "test", start_date: datetime | None = None,
+               end_date: datetime | None = None) -> int:
+        with data_manager.session_maker() as session:
+            session.execute(insert(Client), [
+                {"phone_number": 79000000000 + i, "mobile_operator": "900", "tag": tag,
+                 "time_zone": "Europe/Moscow"}
+                for i in range(clients)
+            ])
+            session.commit()
+        dist_id = data_manager.distributions.add(NewDistribution(
+            name="test", start_date=start_date or datetime.now() - timedelta(days=2),
+            end_date=end_date or datetime.now() - timedelta(days=1), text="test", filter_tag=tag))
+        data_manager.messages.create_distribution_messages(dist_id)
+        return dist_id
+
+    return create
+
+
+@pytest.fixture
+def counters_consistent(engine: Engine) -> Callable[[], bool]:
+    def check() -> bool:
+        with engine.begin() as connection:
+            return rebuild_counters(connection) == []
+
+    return check
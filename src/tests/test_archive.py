@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from db.models import MessageArchive
+
+
+def finish(data_manager, dist_id):
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    data_manager.messages.claim_messages(ids)
+    data_manager.messages.mark_messages_sent(ids)
+    assert data_manager.manage_status(dist_id) == "finished"
+    return ids
+
+
+def test_archive_two_campaigns_in_a_row(data_manager, campaign, counters_consistent):
+    first = campaign(3, tag="first")
+    first_ids = finish(data_manager, first)
+    assert data_manager.messages.archive(datetime.now()) == [first]
+
+    second = campaign(3, tag="second")
+    second_ids = finish(data_manager, second)
+    assert not set(first_ids) & set(second_ids)
+    assert data_manager.messages.archive(datetime.now()) == [second]
+    assert data_manager.messages.archive(datetime.now()) == []
+
+    with data_manager.session_maker() as session:
+        assert session.scalar(select(func.count()).select_from(MessageArchive)) == 6
+    assert counters_consistent()
+
+    stat = data_manager.distributions.get_stat(second, detailed=True, limit=2)
+    assert [message["id"] for message in stat["messages"]["sent"]] == second_ids[:2]
+    stat = data_manager.distributions.get_stat(second, detailed=True, cursor=stat["next_cursor"], limit=2)
+    assert [message["id"] for message in stat["messages"]["sent"]] == second_ids[2:]
+    assert stat["next_cursor"] is None
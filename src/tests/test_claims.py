@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from db.models import Distribution, Message
+from distribution.claims import ChunkClaims
+
+
+def statuses(data_manager, dist_id):
+    with data_manager.session_maker() as session:
+        return dict(session.execute(
+            select(Message.id, Message.status).where(Message.distribution_id == dist_id)).all())
+
+
+def open_campaign(campaign, clients):
+    return campaign(clients, start_date=datetime.now() - timedelta(days=1), end_date=datetime.now() + timedelta(days=1))
+
+
+def distribution_lease(data_manager, dist_id):
+    with data_manager.session_maker() as session:
+        return session.scalar(select(Distribution.lease_expires_at).where(Distribution.id == dist_id))
+
+
+def reset_distribution_lease(data_manager, dist_id):
+    with data_manager.session_maker() as session:
+        session.execute(update(Distribution).where(Distribution.id == dist_id).values(lease_expires_at=None))
+        session.commit()
+
+
+def test_claims_batch_by_batch(data_manager, campaign, counters_consistent):
+    dist_id = open_campaign(campaign, 5)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    claims = iter(ChunkClaims(data_manager, dist_id, ids, batch_size=2))
+    assert next(claims).id == ids[0]
+    assert list(statuses(data_manager, dist_id).values()).count("sending") == 2
+    assert [message.id for message in claims] == ids[1:]
+    assert set(statuses(data_manager, dist_id).values()) == {"sending"}
+    assert counters_consistent()
+
+
+def test_nothing_claimed_after_end_date(data_manager, campaign):
+    dist_id = campaign(3)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    assert list(ChunkClaims(data_manager, dist_id, ids, batch_size=2)) == []
+    assert set(statuses(data_manager, dist_id).values()) == {"created"}
+
+
+def test_expired_leases_are_skipped(data_manager, campaign):
+    dist_id = open_campaign(campaign, 2)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    fresh = ChunkClaims(data_manager, dist_id, ids[:1], batch_size=1)
+    stale = ChunkClaims(data_manager, dist_id, ids[1:], batch_size=1, lease_seconds=10, margin=10)
+    assert [message.id for message in fresh] == ids[:1] and [message.id for message in stale] == ids[1:]
+    assert not fresh.expired(ids[0])
+    assert stale.expired(ids[1])
+    assert fresh.expired(ids[1])
+
+
+def test_distribution_lease_renewed_by_interval(data_manager, campaign):
+    dist_id = open_campaign(campaign, 2)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    claims = ChunkClaims(data_manager, dist_id, ids, batch_size=2, renew_interval=3600)
+    list(claims)
+    assert distribution_lease(data_manager, dist_id) > datetime.now()
+    reset_distribution_lease(data_manager, dist_id)
+    claims.expired(ids[0])
+    assert distribution_lease(data_manager, dist_id) is None
+
+    claims = ChunkClaims(data_manager, dist_id, ids, batch_size=2, renew_interval=0)
+    claims.renew()
+    reset_distribution_lease(data_manager, dist_id)
+    claims.expired(ids[0])
+    assert distribution_lease(data_manager, dist_id) > datetime.now()
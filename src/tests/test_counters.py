@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from configs import SEND_MAX_ATTEMPTS
+from db.models import Distribution, Message
+
+
+def expire_leases(data_manager, message_ids, attempts=None):
+    values = {"lease_expires_at": datetime.now() - timedelta(seconds=1)}
+    if attempts is not None:
+        values["attempts"] = attempts
+    with data_manager.session_maker() as session:
+        session.execute(update(Message).where(Message.id.in_(message_ids)).values(values))
+        session.commit()
+
+
+def statuses(data_manager, dist_id):
+    with data_manager.session_maker() as session:
+        return dict(session.execute(
+            select(Message.id, Message.status).where(Message.distribution_id == dist_id)).all())
+
+
+def test_send_and_fail(data_manager, campaign, counters_consistent):
+    dist_id = campaign(6)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    data_manager.messages.claim_messages(ids)
+    assert counters_consistent()
+    expire_leases(data_manager, ids[4:], attempts=SEND_MAX_ATTEMPTS)
+    data_manager.messages.mark_messages_sent(ids[:2])
+    data_manager.messages.fail_messages({ids[2]: "timeout", ids[3]: "timeout", ids[4]: "rejected"})
+    assert counters_consistent()
+    assert statuses(data_manager, dist_id) == {
+        ids[0]: "sent", ids[1]: "sent", ids[2]: "created", ids[3]: "created", ids[4]: "failed", ids[5]: "sending"}
+    assert data_manager.manage_status(dist_id) == "unfinished"
+
+
+def test_stale_reclaim(data_manager, campaign, counters_consistent):
+    dist_id = campaign(4)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    data_manager.messages.claim_messages(ids)
+    expire_leases(data_manager, ids[:2])
+    assert data_manager.messages.get_pending_message_ids(dist_id) == ids[:2]
+    assert [row.id for row in data_manager.messages.claim_messages(ids)] == ids[:2]
+    assert counters_consistent()
+    data_manager.messages.mark_messages_sent(ids)
+    assert counters_consistent()
+    assert data_manager.manage_status(dist_id) == "finished"
+
+
+def test_fail_after_reclaimed_copy_was_sent(data_manager, campaign, counters_consistent):
+    dist_id = campaign(2)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    data_manager.messages.claim_messages(ids)
+    expire_leases(data_manager, ids)
+    data_manager.messages.claim_messages(ids)
+    data_manager.messages.mark_messages_sent(ids[:1])
+    data_manager.messages.fail_messages({message_id: "timeout" for message_id in ids})
+    assert counters_consistent()
+    assert statuses(data_manager, dist_id) == {ids[0]: "sent", ids[1]: "created"}
+
+
+def test_expired_leases(data_manager, campaign, counters_consistent):
+    dist_id = campaign(3)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    data_manager.messages.claim_messages(ids)
+    expire_leases(data_manager, ids[:2], attempts=SEND_MAX_ATTEMPTS)
+    data_manager.messages.fail_expired_leases(dist_id)
+    assert counters_consistent()
+    assert list(statuses(data_manager, dist_id).values()) == ["failed", "failed", "sending"]
+
+
+def test_client_delete(data_manager, campaign, counters_consistent):
+    dist_id = campaign(3)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    data_manager.messages.claim_messages(ids[:2])
+    data_manager.messages.mark_messages_sent(ids[:1])
+    with data_manager.session_maker() as session:
+        client_ids = list(session.scalars(select(Message.client_id).where(Message.id.in_(ids[:2]))))
+    for client_id in client_ids:
+        assert data_manager.clients.delete(client_id)
+    assert counters_consistent()
+    with data_manager.session_maker() as session:
+        assert session.get(Distribution, dist_id).messages_created == 1
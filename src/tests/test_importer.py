@@ -0,0 +1,39 @@
+import asyncio
+import codecs
+from typing import Dict, List
+
+from services.importer import import_clients
+
+HEADER = codecs.BOM_UTF8 + b"phone_number,mobile_operator,tag,time_zone\r\n"
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def run_import(data, file_format, chunk_size):
+    saved = []
+
+    async def save_batch(batch: List[Dict]):
+        saved.extend(batch)
+
+    return asyncio.run(import_clients(chunked(data, chunk_size), file_format, save_batch)), saved
+
+
+def test_csv_header_with_bom():
+    for chunk_size in (1, 2, 1024):
+        result, saved = run_import(HEADER + b"79001234567,900,a,UTC\r\n", "csv", chunk_size)
+        assert result == {"imported": 1, "failed": 0, "errors": []}
+        assert saved[0]["phone_number"] == 79001234567
+
+
+def test_invalid_utf8_fails_only_its_row():
+    result, saved = run_import(HEADER + b"79001234567,900,\xff,UTC\n79001234568,900,b,UTC\n", "csv", 7)
+    assert result["imported"] == 1 and result["failed"] == 1
+    assert result["errors"][0]["row"] == 1
+    assert [client["phone_number"] for client in saved] == [79001234568]
+
+    result, saved = run_import(b'\xff\n{"phone_number": 79001234567, "mobile_operator": "900", "tag": "a", '
+                               b'"time_zone": "UTC"}\n', "ndjson", 1024)
+    assert result["imported"] == 1 and result["failed"] == 1
@@ -0,0 +1,27 @@
+import pytest
+
+from distribution.protocol import ProtocolError, chunk_payload, distribution_payload, read_chunk_payload, \
+    read_distribution_payload
+
+
+def test_round_trip():
+    assert read_distribution_payload(distribution_payload(7)) == 7
+    assert read_chunk_payload(chunk_payload(7, [5, 1, 2, 3, 9])) == (7, [1, 2, 3, 5, 9])
+
+
+@pytest.mark.parametrize("payload", [
+    None, [], {}, {"v": 2, "d": 1}, {"v": 1}, {"v": 1, "d": "1"}, {"v": 1, "d": True},
+])
+def test_malformed_distribution_payload(payload):
+    with pytest.raises(ProtocolError):
+        read_distribution_payload(payload)
+
+
+@pytest.mark.parametrize("payload", [
+    {"v": 1, "d": 1}, {"v": 1, "d": 1, "ids": None}, {"v": 1, "d": 1, "ids": [[1]]},
+    {"v": 1, "d": 1, "ids": [1, 2]}, {"v": 1, "d": 1, "ids": [[1, "2"]]}, {"v": 1, "d": 1, "ids": [[3, 1]]},
+    {"v": 1, "d": 1, "ids": [[1, 2, 3]]}, {"v": 1, "ids": [[1, 2]]},
+])
+def test_malformed_chunk_payload(payload):
+    with pytest.raises(ProtocolError):
+        read_chunk_payload(payload)
@@ -0,0 +1,37 @@
+from time import sleep
+
+from sqlalchemy import select
+
+from db.models import Message
+from distribution.status_buffer import StatusBuffer
+
+
+def statuses(data_manager, dist_id):
+    with data_manager.session_maker() as session:
+        return dict(session.execute(
+            select(Message.id, Message.status).where(Message.distribution_id == dist_id)).all())
+
+
+def test_flush_by_size(data_manager, campaign, counters_consistent):
+    dist_id = campaign(3)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    data_manager.messages.claim_messages(ids)
+    with StatusBuffer(data_manager, max_size=2, max_delay_ms=60000) as buffer:
+        buffer.sent(ids[0])
+        assert statuses(data_manager, dist_id)[ids[0]] == "sending"
+        buffer.failed(ids[1], "rejected")
+        assert statuses(data_manager, dist_id)[ids[0]] == "sent"
+        buffer.sent(ids[2])
+    assert statuses(data_manager, dist_id)[ids[2]] == "sent"
+    assert counters_consistent()
+
+
+def test_flush_by_timer_without_new_outcomes(data_manager, campaign, counters_consistent):
+    dist_id = campaign(2)
+    ids = data_manager.messages.get_pending_message_ids(dist_id)
+    data_manager.messages.claim_messages(ids)
+    with StatusBuffer(data_manager, max_size=100, max_delay_ms=50) as buffer:
+        buffer.sent(ids[0])
+        sleep(0.3)
+        assert statuses(data_manager, dist_id) == {ids[0]: "sent", ids[1]: "sending"}
+    assert counters_consistent()
@@ -0,0 +1,57 @@
+from time import monotonic
+from types import SimpleNamespace
+
+import pytest
+from requests import HTTPError, Response
+
+from distribution import throttle
+from distribution.throttle import CircuitBreaker, Throttle, TokenBucket, distribution_rate
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis()
+
+
+def too_many_requests(retry_after):
+    response = Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = retry_after
+    return HTTPError(response=response)
+
+
+def test_breaker_open_time_is_capped(redis):
+    breaker = CircuitBreaker(redis, max_open=5)
+    breaker.record(too_many_requests("3600"))
+    assert 0 < redis.pttl("throttle:breaker:open") <= 5000
+
+
+def test_breaker_wait_beats_heartbeat(redis):
+    breaker = CircuitBreaker(redis)
+    breaker.open(0.3)
+    beats = []
+    started = monotonic()
+    breaker.wait(lambda: beats.append(monotonic()), heartbeat_interval=0.05)
+    assert monotonic() - started >= 0.25
+    assert len(beats) >= 4
+
+
+def test_token_bucket_rate_and_heartbeat(redis):
+    beats = []
+    limited = Throttle(CircuitBreaker(redis), [TokenBucket(redis, "throttle:test", rate=20, capacity=1)],
+                       lambda: beats.append(monotonic()), heartbeat_interval=0.01)
+    started = monotonic()
+    for _ in range(5):
+        limited.before_send()
+    assert monotonic() - started >= 0.15
+    assert beats
+
+
+def test_distribution_rate(monkeypatch):
+    monkeypatch.setattr(throttle, "RATE_LIMIT", 10)
+    assert distribution_rate(SimpleNamespace(rate_limit=5)) == 5
+    assert distribution_rate(SimpleNamespace(rate_limit=None)) == 10
+    monkeypatch.setattr(throttle, "RATE_LIMIT", 0)
+    assert distribution_rate(SimpleNamespace(rate_limit=None)) is None